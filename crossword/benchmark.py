@@ -0,0 +1,305 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import generate
+from dictionary import Dictionary, is_compiled
+from generate import *
+
+# Grid sizes in a default run
+SIZES = [5, 9, 15, 21]
+
+# Fraction of black squares in generated grids
+DENSITY = 0.2
+
+# Grids generated per size
+GRIDS = 3
+
+# Seconds a solver may spend on one grid
+TIME_LIMIT = 30
+
+# What a solver can report for a grid: a solution, that none exists, or
+# that it ran out of time
+OUTCOMES = ("solved", "unsat", "timeout")
+
+CONFIGURATIONS = {
+    "backtrack": {"inference": False},
+    "mac": {},
+    "mac+bitsets": {"bitsets": True},
+    "backjumping": {"backjumping": True}
+}
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python benchmark.py words [density] [seed]")
+    words = sys.argv[1]
+    density = float(sys.argv[2]) if len(sys.argv) > 2 else DENSITY
+    rng = random.Random(int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+
+    # Only make entries with lengths that some word has
+    if is_compiled(words):
+        lengths = set(Dictionary(words).lengths())
+    else:
+        with open(words) as f:
+            lengths = set(len(word) for word in f.read().split())
+
+    print(f"{'size':>5} {'solver':<12} {'solved':>6} {'unsat':>5} "
+          f"{'timeout':>7} {'time (s)':>9} {'nodes':>9} {'revisions':>9} "
+          f"{'peak (KiB)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            structures = []
+            for k in range(GRIDS):
+                filename = os.path.join(directory, f"{size}-{k}.txt")
+                with open(filename, "w") as f:
+                    f.write(generate_structure(
+                        size, size, density, rng=rng, lengths=lengths
+                    ))
+                structures.append(filename)
+
+            # Outcome of each solver on each grid, which must agree
+            outcomes = [dict() for _ in structures]
+            for name, options in CONFIGURATIONS.items():
+                results = [
+                    run(structure, words, options)
+                    for structure in structures
+                ]
+                for k, result in enumerate(results):
+                    outcomes[k][name] = result["outcome"]
+                    check_outcomes(outcomes[k], f"{size}x{size} grid {k}")
+                counts = {
+                    outcome: sum(r["outcome"] == outcome for r in results)
+                    for outcome in OUTCOMES
+                }
+                elapsed = sum(result["time"] for result in results)
+                nodes = sum(result["nodes"] for result in results)
+                revisions = sum(result["revisions"] for result in results)
+                peak = max(result["peak"] for result in results)
+                print(f"{size:>5} {name:<12} {counts['solved']:>6} "
+                      f"{counts['unsat']:>5} {counts['timeout']:>7} "
+                      f"{elapsed:>9.3f} {nodes:>9} {revisions:>9} "
+                      f"{peak / 1024:>11.1f}")
+
+
+def check_outcomes(outcomes, grid):
+    """
+    Exit if, among the `outcomes` of solvers on `grid`, one solver found a
+    solution that another proved does not exist.
+    """
+    solved = [name for name, outcome in outcomes.items()
+              if outcome == "solved"]
+    unsat = [name for name, outcome in outcomes.items()
+             if outcome == "unsat"]
+    if solved and unsat:
+        sys.exit(f"Solvers disagree on {grid}: {', '.join(solved)} solved "
+                 f"it but {', '.join(unsat)} found no solution")
+
+
+def generate_structure(height, width, density, symmetry="rotational",
+                       rng=random, lengths=None, attempts=1000, rounds=20):
+    """
+    Return the text of a random crossword structure file with the given
+    size, in which about `density` of the cells are black.
+
+    `symmetry` is "rotational" (unchanged by a half turn, as in most
+    published grids), "mirror" (unchanged by a left-right reflection)
+    or "none".
+
+    The grid follows the usual rules of published crosswords: every
+    entry has at least 3 letters, every white cell is part of both an
+    across and a down entry, and the white cells are connected. If
+    `lengths` is given, every entry has one of those lengths, such as
+    the lengths of the words in a dictionary. Black cells are added one
+    symmetric pair at a time, undoing any that break the rules, until
+    the density is reached or `attempts` placements were tried; if an
+    entry of another length still remains, the grid is generated again,
+    up to `rounds` times before raising ValueError.
+    """
+    if symmetry not in ("rotational", "mirror", "none"):
+        raise ValueError(f"unknown symmetry {symmetry}")
+    if lengths is not None and not any(
+        3 <= length <= max(height, width) for length in lengths
+    ):
+        raise ValueError(f"no entry of a {height}x{width} grid can have "
+                         f"one of the lengths {sorted(lengths)}")
+
+    def partner(i, j):
+        if symmetry == "rotational":
+            return (height - 1 - i, width - 1 - j)
+        elif symmetry == "mirror":
+            return (i, width - 1 - j)
+        return (i, j)
+
+    for _ in range(rounds):
+        black = [[False for _ in range(width)] for _ in range(height)]
+        count = 0
+        for _ in range(attempts):
+            unfit = unfit_cells(black, lengths)
+            if not unfit and count >= density * height * width:
+                break
+
+            # Break up entries that no word fits first
+            if unfit:
+                i, j = rng.choice(unfit)
+            else:
+                i, j = rng.choice([
+                    (i, j) for i in range(height) for j in range(width)
+                    if not black[i][j]
+                ])
+            cells = {(i, j), partner(i, j)}
+            for a, b in cells:
+                black[a][b] = True
+            if follows_rules(black):
+                count += len(cells)
+            else:
+                for a, b in cells:
+                    black[a][b] = False
+
+        if not unfit_cells(black, lengths):
+            break
+    else:
+        raise ValueError(f"found no {height}x{width} grid whose entries "
+                         f"all have lengths in {sorted(lengths)}")
+
+    return "\n".join(
+        "".join("#" if black[i][j] else "_" for j in range(width))
+        for i in range(height)
+    ) + "\n"
+
+
+def entry_lengths(black):
+    """
+    Return dict mapping each white cell of a grid, given as rows of
+    True for black cells, to the lengths of its across and down runs.
+    """
+    height = len(black)
+    width = len(black[0]) if height else 0
+    lengths = dict()
+    for i in range(height):
+        j = 0
+        while j < width:
+            if black[i][j]:
+                j += 1
+                continue
+            end = j
+            while end < width and not black[i][end]:
+                end += 1
+            for k in range(j, end):
+                lengths[i, k] = (end - j, 0)
+            j = end
+    for j in range(width):
+        i = 0
+        while i < height:
+            if black[i][j]:
+                i += 1
+                continue
+            end = i
+            while end < height and not black[end][j]:
+                end += 1
+            for k in range(i, end):
+                lengths[k, j] = (lengths[k, j][0], end - i)
+            i = end
+    return lengths
+
+
+def unfit_cells(black, lengths):
+    """
+    Return list of the white cells of a grid in an entry whose length is
+    not in `lengths`, or no cells if `lengths` is None.
+    """
+    if lengths is None:
+        return []
+    return [
+        cell for cell, (across, down) in entry_lengths(black).items()
+        if across not in lengths or down not in lengths
+    ]
+
+
+def follows_rules(black):
+    """
+    Return True if every white cell of a grid lies in an across and a
+    down entry of at least 3 letters and all white cells are connected.
+    """
+    lengths = entry_lengths(black)
+    if not lengths or any(min(pair) < 3 for pair in lengths.values()):
+        return False
+
+    start = next(iter(lengths))
+    reached = {start}
+    frontier = [start]
+    while frontier:
+        i, j = frontier.pop()
+        for cell in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+            if cell in lengths and cell not in reached:
+                reached.add(cell)
+                frontier.append(cell)
+    return len(reached) == len(lengths)
+
+
+class Deadline():
+    """Stands in for the cancellation event to stop a search on time."""
+
+    def __init__(self, seconds):
+        self.end = time.perf_counter() + seconds
+
+    def is_set(self):
+        return time.perf_counter() > self.end
+
+
+def run(structure, words, options, limit=TIME_LIMIT):
+    """
+    Solve the crossword of files `structure` and `words` with a
+    CrosswordCreator built from `options`, giving up after `limit`
+    seconds. Return a dict with the outcome, one of OUTCOMES, the elapsed
+    time, the search nodes and arc revisions counted by the creator, and
+    the peak memory allocated. A search that returns no solution proved
+    that none exists, unless it was stopped by the deadline.
+
+    Tracing allocations slows the search down, so the peak memory is
+    measured in a second run on a fresh crossword rather than the timed
+    one.
+    """
+    creator = CrosswordCreator(Crossword(structure, words), **options)
+    deadline = Deadline(limit)
+    generate.cancelled = deadline
+    try:
+        start = time.perf_counter()
+        assignment = creator.solve()
+        elapsed = time.perf_counter() - start
+    finally:
+        generate.cancelled = None
+    if assignment is not None:
+        outcome = "solved"
+    elif deadline.is_set():
+        outcome = "timeout"
+    else:
+        outcome = "unsat"
+
+    traced = CrosswordCreator(Crossword(structure, words), **options)
+    generate.cancelled = Deadline(limit)
+    tracemalloc.start()
+    try:
+        traced.solve()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        generate.cancelled = None
+    if assignment is not None and not creator.consistent(assignment):
+        sys.exit(f"Solver {options} returned an inconsistent assignment")
+    return {
+        "outcome": outcome,
+        "time": elapsed,
+        "nodes": creator.stats["nodes"],
+        "revisions": creator.stats["revisions"],
+        "peak": peak
+    }
+
+
+if __name__ == "__main__":
+    main()
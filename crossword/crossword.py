@@ -1,3 +1,6 @@
+from dictionary import Dictionary, is_compiled, pack_bits
+
+
 class Variable():
 
     ACROSS = "across"
@@ -16,8 +19,14 @@ class Variable():
                  self.j + (k if self.direction == Variable.ACROSS else 0))
             )
 
+        # Variables key every domain, overlap and assignment lookup; the
+        # hash avoids strings so it is the same in every process
+        self.hash = hash(
+            (self.i, self.j, self.direction == Variable.ACROSS, self.length)
+        )
+
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self.hash
 
     def __eq__(self, other):
         return (
@@ -57,9 +66,25 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, from a compiled dictionary if given one,
+        # in which case words are only decoded as they are needed
+        self.dictionary = None
+        self._words = None
+        if is_compiled(words_file):
+            self.dictionary = Dictionary(words_file)
+        else:
+            with open(words_file) as f:
+                self._words = set(f.read().upper().splitlines())
+
+        # Index words by length, position and letter; each length (or,
+        # from a compiled dictionary, each letter position) is indexed
+        # the first time a variable asks for it
+        self.length_index = dict() if self.dictionary is not None else None
+        self.letter_index = dict()
+        self.indexed_lengths = set()
+
+        # Bit masks over a global word index, built for bitset domains
+        self.vocabulary = None
 
         # Determine variable set
         self.variables = set()
@@ -125,9 +150,147 @@ class Crossword():
                         cells2.index(intersection)
                     )
 
+        # Precompute the overlapping variables of each variable
+        self.neighbor_map = {
+            var: frozenset(
+                v for v in self.variables
+                if v != var and self.overlaps[v, var]
+            )
+            for var in self.variables
+        }
+
+    @property
+    def words(self):
+        """Set of every vocabulary word."""
+        if self._words is None:
+            self._words = self.dictionary.words()
+        return self._words
+
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.neighbor_map[var]
+
+    def words_of_length(self, length):
+        """Return set of vocabulary words with the given length."""
+        if self.dictionary is not None:
+            if length not in self.length_index:
+                self.length_index[length] = frozenset(
+                    self.dictionary.bucket(length)
+                )
+        elif self.length_index is None:
+            buckets = dict()
+            for word in self.words:
+                buckets.setdefault(len(word), set()).add(word)
+            self.length_index = {
+                n: frozenset(bucket) for n, bucket in buckets.items()
+            }
+        return self.length_index.get(length, frozenset())
+
+    def words_with(self, length, position, letter):
+        """
+        Return set of vocabulary words with the given length that have
+        `letter` at index `position`.
+        """
+        if self.dictionary is not None:
+            key = (length, position, letter)
+            if key not in self.letter_index:
+                bucket = self.dictionary.bucket(length)
+                self.letter_index[key] = frozenset(
+                    bucket[k] for k in set_bits(
+                        self.dictionary.mask(length, position, letter)
+                    )
+                )
+            return self.letter_index[key]
+
+        if length not in self.indexed_lengths:
+            buckets = dict()
+            for word in self.words_of_length(length):
+                for i, c in enumerate(word):
+                    buckets.setdefault((length, i, c), set()).add(word)
+            for key, bucket in buckets.items():
+                self.letter_index[key] = frozenset(bucket)
+            self.indexed_lengths.add(length)
+        return self.letter_index.get((length, position, letter), frozenset())
+
+    def build_masks(self):
+        """
+        Number the vocabulary, sorted by length and then alphabetically,
+        and compute the bit masks used by bitset domains: one per length,
+        and one per (length, position, letter) with bit k set if word k
+        has that length and that letter at that position.
+        """
+        if self.vocabulary is not None:
+            return
+        if self.dictionary is not None:
+            self.load_masks()
+            return
+        self.vocabulary = sorted(self.words, key=lambda word: (len(word), word))
+        self.word_ids = {word: k for k, word in enumerate(self.vocabulary)}
+
+        # Collect the bits of each mask first, then build each mask once
+        lengths = dict()
+        indexes = dict()
+        for k, word in enumerate(self.vocabulary):
+            lengths.setdefault(len(word), []).append(k)
+            for i, c in enumerate(word):
+                indexes.setdefault((len(word), i, c), []).append(k)
+
+        # Words of one length are numbered consecutively
+        self.length_masks = {
+            length: ((1 << len(ks)) - 1) << ks[0]
+            for length, ks in lengths.items()
+        }
+        size = len(self.vocabulary)
+        self.letter_masks = {
+            key: int.from_bytes(pack_bits(ks, size), "little")
+            for key, ks in indexes.items()
+        }
+
+        self.find_letters()
+
+    def load_masks(self):
+        """
+        Build the bitset masks from the compiled dictionary, whose masks
+        cover one length each and are shifted into the global numbering.
+        Only the lengths of the crossword's variables are numbered, so
+        other lengths are never decoded.
+        """
+        self.vocabulary = []
+        self.length_masks = dict()
+        starts = dict()
+        lengths = {var.length for var in self.variables}
+        for length in self.dictionary.lengths():
+            if length not in lengths:
+                continue
+            starts[length] = len(self.vocabulary)
+            self.vocabulary.extend(self.dictionary.bucket(length))
+            self.length_masks[length] = (
+                (1 << self.dictionary.size(length)) - 1
+            ) << starts[length]
+        self.word_ids = {word: k for k, word in enumerate(self.vocabulary)}
+        self.letter_masks = {
+            key: self.dictionary.mask(*key) << starts[key[0]]
+            for key in self.dictionary.masks if key[0] in starts
+        }
+        self.find_letters()
+
+    def find_letters(self):
+        """Record the letters that occur at each (length, position)."""
+        self.letters_at = dict()
+        for length, i, c in self.letter_masks:
+            self.letters_at.setdefault((length, i), []).append(c)
+
+    def words_in_mask(self, mask):
+        """Return list of the vocabulary words whose bits are set in mask."""
+        return [self.vocabulary[k] for k in set_bits(mask)]
+
+
+def set_bits(mask):
+    """Return list of the indexes of the bits set in `mask`."""
+    bits = bin(mask)[:1:-1]
+    indexes = []
+    k = bits.find("1")
+    while k != -1:
+        indexes.append(k)
+        k = bits.find("1", k + 1)
+    return indexes
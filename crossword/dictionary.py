@@ -0,0 +1,179 @@
+import mmap
+import struct
+import sys
+
+# Marks the start of a compiled dictionary file
+MAGIC = b"CWDICT1\0"
+
+# Per length: length, number of words, offset and size of the words
+BUCKET = struct.Struct("<IIQQ")
+
+# Per (length, position, letter): offset and size of the bit mask
+MASK = struct.Struct("<IIIQQ")
+
+COUNT = struct.Struct("<I")
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python dictionary.py words output")
+    count = compile_words(sys.argv[1], sys.argv[2])
+    print(f"Compiled {count} words into {sys.argv[2]}")
+
+
+def compile_words(words_file, output_file):
+    """
+    Compile a words file into a binary dictionary that can be loaded with
+    `Dictionary` without parsing the text again.
+
+    Words are uppercased, bucketed by length and sorted within each bucket.
+    For every (length, position, letter) the file stores a bit mask with
+    bit k set if the kth word of that length has that letter there.
+
+    Return the number of words compiled.
+    """
+    with open(words_file) as f:
+        words = set(f.read().upper().splitlines())
+    words.discard("")
+
+    buckets = dict()
+    for word in words:
+        buckets.setdefault(len(word), []).append(word)
+
+    blobs = []
+    bucket_entries = []
+    mask_entries = []
+    offset = 0
+
+    def place(blob):
+        nonlocal offset
+        blobs.append(blob)
+        offset += len(blob)
+        return offset - len(blob), len(blob)
+
+    for length in sorted(buckets):
+        bucket = sorted(buckets[length])
+        start, size = place("\n".join(bucket).encode("utf-8"))
+        bucket_entries.append((length, len(bucket), start, size))
+
+        indexes = dict()
+        for k, word in enumerate(bucket):
+            for i, c in enumerate(word):
+                indexes.setdefault((i, c), []).append(k)
+        for (i, c), ks in sorted(indexes.items()):
+            start, size = place(pack_bits(ks, len(bucket)))
+            mask_entries.append((length, i, ord(c), start, size))
+
+    # Offsets in the tables are relative to the end of the header
+    header = b"".join([
+        MAGIC,
+        COUNT.pack(len(bucket_entries)),
+        *(BUCKET.pack(*entry) for entry in bucket_entries),
+        COUNT.pack(len(mask_entries)),
+        *(MASK.pack(*entry) for entry in mask_entries)
+    ])
+    with open(output_file, "wb") as f:
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return len(words)
+
+
+def pack_bits(indexes, size):
+    """
+    Return bytes of a little-endian bit mask over `size` bits with the
+    bits at `indexes` set. Setting bits in a buffer and converting it
+    once avoids building a new, ever larger int for every bit.
+    """
+    mask = bytearray((size + 7) // 8)
+    for k in indexes:
+        mask[k >> 3] |= 1 << (k & 7)
+    return bytes(mask)
+
+
+def is_compiled(filename):
+    """Return True if `filename` is a compiled dictionary."""
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class Dictionary():
+
+    def __init__(self, filename):
+        """
+        Open a compiled dictionary. The file is memory-mapped read-only,
+        so processes that load the same file share its pages.
+        """
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filename} is not a compiled dictionary")
+
+        position = len(MAGIC)
+        (count,) = COUNT.unpack_from(self.data, position)
+        position += COUNT.size
+        entries = []
+        for _ in range(count):
+            entries.append(BUCKET.unpack_from(self.data, position))
+            position += BUCKET.size
+        (count,) = COUNT.unpack_from(self.data, position)
+        position += COUNT.size
+        masks = []
+        for _ in range(count):
+            masks.append(MASK.unpack_from(self.data, position))
+            position += MASK.size
+
+        # Map lengths and letter positions to absolute file ranges
+        self.buckets = {
+            length: (size, position + start, position + start + nbytes)
+            for length, size, start, nbytes in entries
+        }
+        self.masks = {
+            (length, i, chr(c)): (position + start, position + start + nbytes)
+            for length, i, c, start, nbytes in masks
+        }
+        self.words_by_length = dict()
+
+    def __reduce__(self):
+        # Reopen the file rather than pickling the mapped contents
+        return (Dictionary, (self.filename,))
+
+    def lengths(self):
+        """Return sorted list of the word lengths in the dictionary."""
+        return sorted(self.buckets)
+
+    def size(self, length):
+        """Return number of words with the given length."""
+        return self.buckets[length][0] if length in self.buckets else 0
+
+    def bucket(self, length):
+        """Return sorted list of the words with the given length."""
+        if length not in self.words_by_length:
+            if length in self.buckets:
+                _, start, end = self.buckets[length]
+                words = self.data[start:end].decode("utf-8").split("\n")
+            else:
+                words = []
+            self.words_by_length[length] = words
+        return self.words_by_length[length]
+
+    def words(self):
+        """Return set of every word in the dictionary."""
+        return set(
+            word for length in self.lengths() for word in self.bucket(length)
+        )
+
+    def mask(self, length, position, letter):
+        """
+        Return bit mask over the words of the given length, with bit k set
+        if the kth of them has `letter` at `position`.
+        """
+        if (length, position, letter) not in self.masks:
+            return 0
+        start, end = self.masks[length, position, letter]
+        return int.from_bytes(self.data[start:end], "little")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,68 @@
-import queue
-from re import T
-from sre_constants import FAILURE
+import collections
+import concurrent.futures
+import multiprocessing
+import random
 import sys
-import copy
 
 from crossword import *
+import render
+
+# Set in portfolio workers; once set, the search gives up because another
+# configuration has already found a solution
+cancelled = None
 
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, bitsets=False, inference=True, seed=None,
+                 lcv=True, backjumping=False, nogood_limit=1000):
         """
         Create new CSP crossword generate.
+
+        If `bitsets` is True, each domain is an integer bit mask over the
+        crossword's numbered vocabulary instead of a set of words.
+        If `inference` is True, backtracking maintains arc consistency
+        after every assignment.
+        If `seed` is given, ties between variables and between values are
+        broken randomly with that seed instead of in a fixed order.
+        If `lcv` is False, values are tried in domain order (shuffled, if
+        seeded) rather than least-constraining first.
+        If `backjumping` is True, the search uses conflict-directed
+        backjumping instead of `inference`, and remembers up to
+        `nogood_limit` of the combinations of words that caused failures,
+        evicting the least recently used.
         """
         self.crossword = crossword
-        self.domains = {
-            var: self.crossword.words.copy()
-            for var in self.crossword.variables
-        }
+        self.bitsets = bitsets
+        self.inference = inference
+        self.random = random.Random(seed) if seed is not None else None
+        self.lcv = lcv
+        self.backjumping = backjumping
+        self.nogood_limit = nogood_limit
+        if bitsets:
+            self.crossword.build_masks()
+            everything = (1 << len(self.crossword.vocabulary)) - 1
+            self.domains = {var: everything for var in self.crossword.variables}
+        else:
+            # Domains are replaced rather than changed in place, so every
+            # variable can start from the shared words of its length
+            self.domains = {
+                var: self.crossword.words_of_length(var.length)
+                for var in self.crossword.variables
+            }
+
+        # Counters of search nodes, arc revisions made and values pruned
+        self.stats = {"nodes": 0, "revisions": 0, "pruned": 0}
+
+        # While searching, (variable, old domain) for every domain change,
+        # so that backtracking can undo inferences instead of copying
+        self.trail = None
+
+        # Learned nogoods, frozensets of (variable, word) pairs that cannot
+        # all hold in a solution, least recently used first, and for each
+        # pair the nogoods that contain it
+        self.nogoods = collections.OrderedDict()
+        self.nogood_index = dict()
 
     def letter_grid(self, assignment):
         """
@@ -52,50 +97,106 @@ class CrosswordCreator():
         """
         Save crossword assignment to an image file.
         """
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
-        letters = self.letter_grid(assignment)
-
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
+        render.renderer().save(
+            self.crossword.structure, self.letter_grid(assignment), filename
         )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
-
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
-
-        img.save(filename)
 
-    def solve(self):
+    def solve(self, portfolio=None, workers=None):
         """
         Enforce node and arc consistency, and then solve the CSP.
+
+        If `portfolio` is given, it is either a number of searches or a
+        list of dicts of CrosswordCreator options, one per search. The
+        searches run in a pool of `workers` processes and the first
+        complete assignment found is returned; the others are stopped.
         """
+        if portfolio is not None:
+            return self.solve_portfolio(portfolio, workers)
         self.enforce_node_consistency()
         self.ac3()
-        return self.backtrack(dict())
+        if self.backjumping:
+            return self.backjump(dict())[0]
+        self.trail = []
+        try:
+            return self.backtrack(dict())
+        finally:
+            self.trail = None
+
+    def solve_portfolio(self, portfolio, workers=None):
+        """
+        Race differently ordered searches in a process pool and return
+        the first complete assignment, or None if there is none.
+        """
+        if isinstance(portfolio, int):
+
+            # The creator's own configuration, then randomly ordered copies
+            options = {
+                "bitsets": self.bitsets,
+                "inference": self.inference,
+                "lcv": self.lcv,
+                "backjumping": self.backjumping,
+                "nogood_limit": self.nogood_limit
+            }
+            portfolio = [dict(options)] + [
+                dict(options, seed=seed) for seed in range(1, portfolio)
+            ]
+
+        event = multiprocessing.Event()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=start_worker, initargs=(event,)
+        ) as executor:
+            futures = [
+                executor.submit(solve_with, self.crossword, options)
+                for options in portfolio
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                assignment, stats = future.result()
+                if assignment is not None:
+
+                    # Stop the other searches and drop those not started
+                    event.set()
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    self.stats = stats
+                    return assignment
+        return None
+
+    def fills(self, limit=None, seed=None, patience=100):
+        """
+        Yield distinct complete assignments, at most `limit` of them.
+
+        Node and arc consistency are enforced once; each restart searches
+        again from those domains with a fresh random order of values.
+        Assignments using the same set of words as an earlier one are
+        skipped, and the generator stops after `patience` restarts in a
+        row find nothing new.
+        """
+        self.enforce_node_consistency()
+        if not self.ac3():
+            return
+        domains = self.domains.copy()
+        order = (self.random, self.lcv)
+        self.random, self.lcv = random.Random(seed), False
+
+        seen = set()
+        misses = 0
+        try:
+            while (limit is None or len(seen) < limit) and misses < patience:
+                self.domains = domains.copy()
+                self.trail = []
+                assignment = self.backtrack(dict())
+                if assignment is None:
+                    return
+                words = frozenset(assignment.values())
+                if words in seen:
+                    misses += 1
+                    continue
+                seen.add(words)
+                misses = 0
+                yield dict(assignment)
+        finally:
+            self.domains = domains
+            self.trail = None
+            self.random, self.lcv = order
 
     def enforce_node_consistency(self):
         """
@@ -105,11 +206,11 @@ class CrosswordCreator():
         """
         # enforce length
         for var in self.domains:
-            dom = self.domains[var].copy()
-            for word in self.domains[var]:
-                if len(word) !=  var.length:
-                    dom.remove(word)
-            self.domains[var] = dom
+            if self.bitsets:
+                words = self.crossword.length_masks.get(var.length, 0)
+            else:
+                words = self.crossword.words_of_length(var.length)
+            self.set_domain(var, self.domains[var] & words)
 
     def revise(self, x, y):
         """
@@ -120,39 +221,72 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        # overlap = self.crossword.overlaps[x, y]
-        # remove_words = []
-
-        # if overlap is None:
-        #     return False
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is None:
+            return False
+        i, j = overlap
+        if self.bitsets:
+            return self.revise_bits(x, y, i, j)
+
+        # Keep the words of x whose letter at the overlap is one that some
+        # word of y has there, looked up in the letter-position index
+        x_domain = self.domains[x]
+        supported = set()
+        for letter in {word[j] for word in self.domains[y]}:
+            supported |= x_domain & self.crossword.words_with(
+                x.length, i, letter
+            )
+        if len(supported) == len(x_domain):
+            return False
+        self.set_domain(x, supported)
+        return True
 
+    def revise_bits(self, x, y, i, j):
+        """
+        Revise bitset domain of `x` against `y`, where x's ith letter
+        overlaps y's jth letter.
+        """
+        masks = self.crossword.letter_masks
+        y_domain = self.domains[y]
+        supported = 0
+        for letter in self.crossword.letters_at.get((y.length, j), ()):
+            if y_domain & masks[y.length, j, letter]:
+                supported |= masks.get((x.length, i, letter), 0)
         x_domain = self.domains[x]
-        
-        x_domain_copy = x_domain.copy()
-        revised = False
-        for dx in x_domain:
-            satisfies = False
-            y_domain = self.domains[y]
-            for dy in y_domain:
-                if dx != dy:
-                    assignment = {}
-                    assignment[x] = dx
-                    assignment[y] = dy
-                    if self.consistent(assignment):
-                         satisfies = True
-                    if satisfies == False:
-                        x_domain_copy.remove(dx)
-                        revised = True
-                        break
-            if len(x_domain_copy) == 1:
-
-                break
-        self.domains[x] = x_domain_copy
-        self.domains[x]
-        return revised
-            
-    def ac3(self, arcs=None):
+        if x_domain & supported == x_domain:
+            return False
+        self.set_domain(x, x_domain & supported)
+        return True
 
+    def set_domain(self, var, domain):
+        """Replace the domain of `var`, recording the change on the trail."""
+        if self.trail is not None:
+            self.trail.append((var, self.domains[var]))
+        self.domains[var] = domain
+
+    def undo(self, mark):
+        """Restore every domain changed since the trail had length `mark`."""
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
+
+    def domain_values(self, var):
+        """Return list of the words in the domain of `var`."""
+        if self.bitsets:
+            return self.crossword.words_in_mask(self.domains[var])
+        return list(self.domains[var])
+
+    def domain_size(self, var):
+        """Return number of words in the domain of `var`."""
+        return self.count(self.domains[var])
+
+    def count(self, domain):
+        """Return number of words in a domain of either representation."""
+        if self.bitsets:
+            return domain.bit_count()
+        return len(domain)
+
+    def ac3(self, arcs=None):
         """
         Update `self.domains` such that each variable is arc consistent.
         If `arcs` is None, begin with initial list of all arcs in the problem.
@@ -161,41 +295,36 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        consistency_enforced = True
         if arcs is None:
-            arcs = []
-            for i in self.crossword.variables:
-                for j in self.crossword.neighbors(i):
-                    if i != j:
-                        arcs.append((i,j))
-        
-        while len(arcs) > 0:
-            (x, y) = arcs.pop()
-
-            if self.revise(x ,y) == True:
-                #
-                # for neighbor in self.crossword.neighbors(x):
-                #     arcs.append((x, neighbor))
-                #
-
-                if len(self.domains[x]) == 0:
+            arcs = [
+                (x, y)
+                for x in self.crossword.variables
+                for y in self.crossword.neighbors(x)
+            ]
+
+        # Queue of arcs to revise, with a set to keep each arc queued once
+        pending = collections.deque(arcs)
+        queued = set(pending)
+
+        while pending:
+            x, y = pending.popleft()
+            queued.discard((x, y))
+
+            domain = self.domains[x]
+            self.stats["revisions"] += 1
+            if self.revise(x, y):
+                self.stats["pruned"] += (
+                    self.count(domain) - self.count(self.domains[x])
+                )
+                if not self.domains[x]:
                     return False
-                consistency_enforced = False
-                if len(self.domains[y]) > 0:
-                    neighbors = copy.deepcopy(self.crossword.neighbors(x))
-                    
-                    if y in neighbors:
-                        neighbors = neighbors - {y}
-                    
-                    for n in neighbors:
-                        arcs.append((n, x))
-                        if n == y:
-                            neighbors.remove(y)
-                            for z in neighbors:
-                                if (z,x) not in arcs:
-                                    arcs.append((z, x))
-        # return consistency_enforced
-        return len(self.domains[x]) > 0
+
+                # Revising x may break arcs into x from its other neighbors
+                for z in self.crossword.neighbors(x):
+                    if z != y and (z, x) not in queued:
+                        pending.append((z, x))
+                        queued.add((z, x))
+        return True
 
     def assignment_complete(self, assignment):
         """
@@ -208,35 +337,84 @@ class CrosswordCreator():
         return True
 
     def consistent(self, assignment):
-        keys = [*assignment]
-        if len(keys) > 1:
-            var0 = keys[0]
-            var1 = keys[1]
-            word0 = assignment[var0]
-            word1 = assignment[var1]
-            
-            if len(word0) != var0.length:
+        """
+        Return True if `assignment` is consistent (i.e., words fit in
+        crossword puzzle without conflicting characters); return False
+        otherwise.
+        """
+        checked = dict()
+        for var, word in assignment.items():
+            if len(word) != var.length:
                 return False
-            if var0 != var1:
-                if word0 == word1:
-                    return False
-                overlap = self.crossword.overlaps[(keys[0], keys[1])]
-                if overlap is not None:
-                    if word0[overlap[0]] != word1[overlap[1]]:
-                        return False
+            if self.conflict(var, word, checked) is not None:
+                return False
+            checked[var] = word
         return True
 
-    def order_domain_values(self, var, assignment):
+    def conflict(self, var, value, assignment):
+        """
+        Return a variable of `assignment` whose word cannot be used together
+        with `value` for `var`, or None if there is none.
+        """
+        for other, word in assignment.items():
+            if other == var:
+                continue
+            if word == value:
+                return other
+            overlap = self.crossword.overlaps[var, other]
+            if overlap is not None and value[overlap[0]] != word[overlap[1]]:
+                return other
+        return None
+
+    def order_domain_values(self, var, assignment, values=None):
         """
         Return a list of values in the domain of `var`, in order by
         the number of values they rule out for neighboring variables.
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
+        If `values` is given, order those words instead of the domain.
+        """
+        # For each unassigned neighbor, how many of its words have each
+        # letter at the overlapping cell
+        neighbors = []
+        for y in self.crossword.neighbors(var):
+            if y in assignment:
+                continue
+            i, j = self.crossword.overlaps[var, y]
+            neighbors.append((i, self.domain_size(y), self.letter_counts(y, j)))
+
+        def ruled_out(value):
+            return sum(
+                size - counts.get(value[i], 0)
+                for i, size, counts in neighbors
+            )
+
+        if values is None:
+            values = self.domain_values(var)
+        if self.random is not None:
+            self.random.shuffle(values)
+        if not self.lcv:
+            return values
+        return sorted(values, key=ruled_out)
+
+    def letter_counts(self, var, position):
+        """
+        Return dict mapping each letter to the number of words in the
+        domain of `var` with that letter at `position`.
         """
-        # vals = [*self.domain[var]]
-        # for val in vals:
-        #     self.crossword.neighbors(var)
-        return self.domains[var]
+        if self.bitsets:
+            domain = self.domains[var]
+            masks = self.crossword.letter_masks
+            return {
+                letter: (domain & masks[var.length, position, letter])
+                .bit_count()
+                for letter in self.crossword.letters_at.get(
+                    (var.length, position), ()
+                )
+            }
+        return collections.Counter(
+            word[position] for word in self.domains[var]
+        )
 
     def select_unassigned_variable(self, assignment):
         """
@@ -246,11 +424,17 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        for variable in self.crossword.variables:
-            if variable not in assignment:
-                return variable
-        return None
-
+        unassigned = [
+            var for var in self.crossword.variables if var not in assignment
+        ]
+        if not unassigned:
+            return None
+        if self.random is not None:
+            self.random.shuffle(unassigned)
+        return min(unassigned, key=lambda var: (
+            self.domain_size(var),
+            -sum(y not in assignment for y in self.crossword.neighbors(var))
+        ))
 
     def backtrack(self, assignment):
         """
@@ -260,21 +444,200 @@ class CrosswordCreator():
         `assignment` is a mapping from variables (keys) to words (values).
 
         If no assignment is possible, return None.
-        """ 
-        if self.assignment_complete(assignment) == True:
+        """
+        if self.assignment_complete(assignment):
             return assignment
 
-        unassigned = self.select_unassigned_variable(assignment)
-        for value in self.order_domain_values(unassigned, assignment):
-            assignment[unassigned] = value
-            if self.consistent(assignment):
+        # Another portfolio search already found a solution
+        if cancelled is not None and cancelled.is_set():
+            return None
+
+        var = self.select_unassigned_variable(assignment)
+        for value in self.order_domain_values(var, assignment):
+            self.stats["nodes"] += 1
+            if self.conflict(var, value, assignment) is not None:
+                continue
+            assignment[var] = value
+
+            # Infer what the assignment implies, undoing it on failure
+            mark = len(self.trail) if self.trail is not None else 0
+            if not self.inference or self.infer(var, value, assignment):
                 result = self.backtrack(assignment)
                 if result is not None:
                     return result
-                assignment[unassigned] = None
+            if self.trail is not None:
+                self.undo(mark)
+            del assignment[var]
+        return None
+
+    def infer(self, var, value, assignment):
+        """
+        Reduce the domain of `var` to `value`, remove `value` from the
+        domains of other unassigned variables of the same length, and
+        restore arc consistency with the unassigned neighbors of `var`.
+
+        Return False if some domain becomes empty, True otherwise.
+        """
+        if self.bitsets:
+            bit = 1 << self.crossword.word_ids[value]
+            self.set_domain(var, bit)
+        else:
+            self.set_domain(var, {value})
+
+        # Words may not be used twice in the puzzle
+        for other in self.crossword.variables:
+            if other in assignment or other.length != var.length:
+                continue
+            domain = self.domains[other]
+            if self.bitsets:
+                if domain & bit:
+                    self.set_domain(other, domain & ~bit)
+            elif value in domain:
+                self.set_domain(other, domain - {value})
+            if not self.domains[other]:
+                return False
+
+        return self.ac3([
+            (y, var) for y in self.crossword.neighbors(var)
+            if y not in assignment
+        ])
+
+    def backjump(self, assignment):
+        """
+        Using backtracking search with conflict-directed backjumping, take
+        as input a partial assignment and return a tuple (result, conflicts).
+
+        `result` is a complete assignment, or None if none extends
+        `assignment`. In that case `conflicts` is the set of assigned
+        variables responsible for the failure, and search jumps back to
+        the most recent of them instead of the previous variable.
+        """
+        if self.assignment_complete(assignment):
+            return assignment, set()
+
+        # Another portfolio search already found a solution
+        if cancelled is not None and cancelled.is_set():
+            return None, set()
+
+        var = self.select_unassigned_variable(assignment)
+
+        # Only try words that fit the letters already crossing var; the
+        # neighbors that ruled words out share the blame for any failure
+        values, conflicts = self.compatible_values(var, assignment)
+        placed = set(assignment.items())
+        for value in self.order_domain_values(var, assignment, values):
+            self.stats["nodes"] += 1
+
+            # Values ruled out by an earlier word or by a learned nogood
+            culprit = self.conflict(var, value, assignment)
+            if culprit is not None:
+                conflicts.add(culprit)
+                continue
+            culprits = self.nogood_conflict(var, value, placed)
+            if culprits is not None:
+                conflicts |= culprits
+                continue
+
+            assignment[var] = value
+            result, jump = self.backjump(assignment)
+            if result is not None:
+                return result, set()
+            del assignment[var]
+
+            # If var played no part in the failure, changing it cannot help
+            if var not in jump:
+                return None, jump
+            conflicts |= jump - {var}
+
+        # The words of the conflicting variables cannot all be used together
+        self.learn(frozenset((v, assignment[v]) for v in conflicts))
+        return None, conflicts
+
+    def compatible_values(self, var, assignment):
+        """
+        Return a tuple (values, culprits): the words in the domain of `var`
+        that agree with every assigned neighbor at their overlap, and the
+        assigned neighbors, which are what rules the other words out.
+        """
+        culprits = set()
+        constraints = [self.domains[var]]
+        for y in self.crossword.neighbors(var):
+            if y not in assignment:
+                continue
+            i, j = self.crossword.overlaps[var, y]
+            letter = assignment[y][j]
+            culprits.add(y)
+            if self.bitsets:
+                constraints.append(self.crossword.letter_masks.get(
+                    (var.length, i, letter), 0
+                ))
+            else:
+                constraints.append(
+                    self.crossword.words_with(var.length, i, letter)
+                )
+        if self.bitsets:
+            domain = constraints[0]
+            for mask in constraints[1:]:
+                domain &= mask
+            return self.crossword.words_in_mask(domain), culprits
+
+        # Intersect the smallest sets first
+        constraints.sort(key=len)
+        domain = constraints[0]
+        for words in constraints[1:]:
+            domain = domain & words
+        return list(domain), culprits
+
+    def learn(self, nogood):
+        """Add `nogood` to the store, evicting the least recently used."""
+        if not nogood or self.nogood_limit <= 0:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.nogood_index.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.nogood_limit:
+            old, _ = self.nogoods.popitem(last=False)
+            for pair in old:
+                self.nogood_index[pair].discard(old)
+                if not self.nogood_index[pair]:
+                    del self.nogood_index[pair]
+
+    def nogood_conflict(self, var, value, placed):
+        """
+        Return the other variables of a learned nogood that assigning
+        `value` to `var` would complete, or None if there is none.
+        `placed` is the set of (variable, word) pairs already assigned.
+        """
+        nogoods = self.nogood_index.get((var, value))
+        if not nogoods:
+            return None
+        placed.add((var, value))
+        try:
+            for nogood in nogoods:
+                if nogood <= placed:
+                    self.nogoods.move_to_end(nogood)
+                    return {v for v, _ in nogood if v != var}
+        finally:
+            placed.discard((var, value))
         return None
 
 
+def solve_with(crossword, options):
+    """
+    Solve `crossword` with a CrosswordCreator built from `options`.
+    Return the assignment found and the search counters.
+    """
+    creator = CrosswordCreator(crossword, **options)
+    return creator.solve(), creator.stats
+
+
+def start_worker(event):
+    """Shares the cancellation event with a portfolio worker."""
+    global cancelled
+    cancelled = event
 
 
 def main():
@@ -0,0 +1,116 @@
+import concurrent.futures
+import functools
+import string
+
+FONT = "assets/fonts/OpenSans-Regular.ttf"
+
+# Set in batch workers to the renderer each worker builds once
+worker_renderer = None
+
+
+class Renderer():
+
+    def __init__(self, font_file=FONT, cell_size=100, cell_border=2,
+                 font_size=80):
+        """
+        Load the font once and pre-render the tiles for a black cell, an
+        empty white cell and a white cell with each letter A-Z.
+        """
+        from PIL import Image, ImageDraw, ImageFont
+        self.Image = Image
+        self.ImageDraw = ImageDraw
+        self.font = ImageFont.truetype(font_file, font_size)
+        self.cell_size = cell_size
+        self.cell_border = cell_border
+
+        self.black = Image.new("RGBA", (cell_size, cell_size), "black")
+        self.blank = self.black.copy()
+        ImageDraw.Draw(self.blank).rectangle(
+            [(cell_border, cell_border),
+             (cell_size - cell_border, cell_size - cell_border)],
+            fill="white"
+        )
+        self.tiles = {
+            letter: self.letter_tile(letter)
+            for letter in string.ascii_uppercase
+        }
+
+    def letter_tile(self, letter):
+        """Return a white cell with `letter` drawn in its center."""
+        interior_size = self.cell_size - 2 * self.cell_border
+        tile = self.blank.copy()
+        draw = self.ImageDraw.Draw(tile)
+        _, _, w, h = draw.textbbox((0, 0), letter, font=self.font)
+        draw.text(
+            (self.cell_border + ((interior_size - w) / 2),
+             self.cell_border + ((interior_size - h) / 2) - 10),
+            letter, fill="black", font=self.font
+        )
+        return tile
+
+    def tile(self, letter):
+        """Return the tile for `letter`, rendering it if not seen before."""
+        if letter not in self.tiles:
+            self.tiles[letter] = self.letter_tile(letter)
+        return self.tiles[letter]
+
+    def render(self, structure, letters):
+        """
+        Return an image of a crossword, given its structure (True for
+        white cells) and the letter, or None, in each cell.
+        """
+        height = len(structure)
+        width = len(structure[0]) if height else 0
+        img = self.Image.new(
+            "RGBA",
+            (width * self.cell_size, height * self.cell_size),
+            "black"
+        )
+        for i in range(height):
+            for j in range(width):
+                if not structure[i][j]:
+                    continue
+                tile = self.tile(letters[i][j]) if letters[i][j] else self.blank
+                img.paste(tile, (j * self.cell_size, i * self.cell_size))
+        return img
+
+    def save(self, structure, letters, filename):
+        """Render a crossword and save it to an image file."""
+        self.render(structure, letters).save(filename)
+
+
+@functools.lru_cache(maxsize=None)
+def renderer(font_file=FONT):
+    """Return a shared renderer for `font_file`, built on first use."""
+    return Renderer(font_file)
+
+
+def save_batch(creator, assignments, filenames, workers=None, font_file=FONT):
+    """
+    Save each of `assignments` of `creator`'s crossword to the matching
+    file in `filenames`, rendering in a pool of `workers` processes that
+    each load the font and tiles once.
+    """
+    structure = creator.crossword.structure
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=start_worker, initargs=(font_file,)
+    ) as executor:
+        futures = [
+            executor.submit(
+                save_grid, structure, creator.letter_grid(assignment), filename
+            )
+            for assignment, filename in zip(assignments, filenames)
+        ]
+        for future in futures:
+            future.result()
+
+
+def start_worker(font_file):
+    """Build the renderer a batch worker uses for all of its grids."""
+    global worker_renderer
+    worker_renderer = Renderer(font_file)
+
+
+def save_grid(structure, letters, filename):
+    """Save one grid with the worker's renderer."""
+    worker_renderer.save(structure, letters, filename)
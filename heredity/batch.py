@@ -0,0 +1,149 @@
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+
+from heredity import enumerate_probabilities, inheritance, load_data
+from elimination import marginals
+from junction import JunctionTree
+
+# Output columns, one row per person
+FIELDS = ["family", "name", "gene_2", "gene_1", "gene_0", "trait"]
+
+# Set in batch workers to the inference function they use for every family
+worker_engine = None
+
+
+def junction_marginals(people):
+    """Return the marginals of a calibrated junction tree of `people`."""
+    return JunctionTree(people).marginals()
+
+
+ENGINES = {
+    "enumerate": enumerate_probabilities,
+    "elimination": marginals,
+    "junction": junction_marginals
+}
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4, 5]:
+        sys.exit("Usage: python batch.py families [csv|jsonl] [engine] "
+                 "[workers]")
+    source = sys.argv[1]
+    output_format = sys.argv[2] if len(sys.argv) > 2 else "csv"
+    engine = sys.argv[3] if len(sys.argv) > 3 else "junction"
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    if output_format not in ("csv", "jsonl"):
+        sys.exit(f"Unknown output format {output_format}")
+    if engine not in ENGINES:
+        sys.exit(f"Unknown engine {engine}, expected one of "
+                 f"{', '.join(ENGINES)}")
+
+    results = run_batch(family_files(source), engine, workers)
+    failed = write_results(results, sys.stdout, output_format)
+    if failed:
+        sys.exit(f"{failed} families could not be scored")
+
+
+def family_files(source):
+    """
+    Return list of the family CSV files named by `source`: every .csv
+    file in it, sorted, if it is a directory, or else every line of it
+    as a manifest, skipping blank lines and lines starting with #.
+    Relative paths in a manifest are relative to the manifest itself.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.endswith(".csv")
+        )
+    directory = os.path.dirname(source)
+    with open(source) as f:
+        return [
+            os.path.join(directory, line.strip()) for line in f
+            if line.strip() and not line.strip().startswith("#")
+        ]
+
+
+def run_batch(files, engine="junction", workers=None, chunksize=16):
+    """
+    Compute the probabilities of every family in `files` with `engine`,
+    in a pool of `workers` processes that each build the shared tables
+    once. Yield (filename, probabilities, error) triples in the order of
+    `files` as they become available, where `error` describes why the
+    family could not be scored, in which case `probabilities` is None,
+    or is None.
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=start_worker, initargs=(engine,)
+    ) as executor:
+        for filename, (probabilities, error) in zip(
+            files, executor.map(score_family, files, chunksize=chunksize)
+        ):
+            yield filename, probabilities, error
+
+
+def start_worker(engine):
+    """Choose the engine of a batch worker and build its shared tables."""
+    global worker_engine
+    worker_engine = ENGINES[engine]
+    inheritance()
+
+
+def score_family(filename):
+    """
+    Load one family and compute its probabilities with the engine.
+    Return a tuple of the probabilities, or None if the family could not
+    be read or scored, and a description of the error, or None.
+    """
+    try:
+        return worker_engine(load_data(filename)), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def records(filename, probabilities):
+    """Return list of one output row per person of a family, as dicts."""
+    return [
+        {
+            "family": filename,
+            "name": person,
+            "gene_2": probabilities[person]["gene"][2],
+            "gene_1": probabilities[person]["gene"][1],
+            "gene_0": probabilities[person]["gene"][0],
+            "trait": probabilities[person]["trait"][True]
+        }
+        for person in probabilities
+    ]
+
+
+def write_results(results, output, output_format="csv"):
+    """
+    Write the rows of each (filename, probabilities, error) triple in
+    `results` to the file object `output` as it arrives, as CSV with a
+    header or as one JSON object per line (JSONL). Families with an
+    error are reported on stderr instead.
+
+    Return the number of families that could not be scored.
+    """
+    if output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+    failed = 0
+    for filename, probabilities, error in results:
+        if error is not None:
+            print(f"{filename}: {error}", file=sys.stderr)
+            failed += 1
+            continue
+        for record in records(filename, probabilities):
+            if output_format == "csv":
+                writer.writerow(record)
+            else:
+                output.write(json.dumps(record) + "\n")
+    return failed
+
+
+if __name__ == "__main__":
+    main()
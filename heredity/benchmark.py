@@ -0,0 +1,194 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+from heredity import load_data, vectorized_probabilities
+from batch import ENGINES
+from sampling import MIN_ESS, sample_probabilities
+
+# Pedigree sizes (generations, people per generation) in a default run
+SIZES = [(2, 2), (2, 3), (3, 3), (5, 8), (10, 20), (20, 40)]
+
+# Fraction of people whose trait is known
+OBSERVED = 0.5
+
+# Chance that two people of a generation have children together, rather
+# than each having them with someone from outside the family
+LOOPS = 0.1
+
+# Samples drawn by the sampling engine
+SAMPLES = 20000
+
+# Largest pedigree, in people, each engine is run on
+MAX_PEOPLE = {
+    "enumerate": 10,
+    "vectorized": 12,
+    "elimination": 400
+}
+
+# Largest difference allowed between an exact engine and the reference
+TOLERANCE = 1e-9
+
+# Most standard errors a likelihood weighting estimate may be off by
+SIGMAS = 4
+
+
+def gibbs_probabilities(people):
+    """Return the probabilities estimated by a seeded Gibbs sampler."""
+    return sample_probabilities(people, SAMPLES, seed=0)[0]
+
+
+# Engines to time, the first of which is the reference for the others
+BENCHMARKS = {
+    "junction": ENGINES["junction"],
+    "elimination": ENGINES["elimination"],
+    "enumerate": ENGINES["enumerate"],
+    "vectorized": vectorized_probabilities,
+    "gibbs": gibbs_probabilities
+}
+
+# Engines whose results are only approximate
+APPROXIMATE = {"gibbs"}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "generate":
+        if len(sys.argv) not in [5, 6, 7]:
+            sys.exit("Usage: python benchmark.py generate output depth width "
+                     "[observed] [seed]")
+        observed = float(sys.argv[5]) if len(sys.argv) > 5 else OBSERVED
+        rng = random.Random(int(sys.argv[6]) if len(sys.argv) > 6 else None)
+        with open(sys.argv[2], "w") as f:
+            f.write(generate_pedigree(
+                int(sys.argv[3]), int(sys.argv[4]), observed, rng=rng
+            ))
+        return
+
+    if len(sys.argv) not in [1, 2, 3]:
+        sys.exit("Usage: python benchmark.py [observed] [seed]")
+    observed = float(sys.argv[1]) if len(sys.argv) > 1 else OBSERVED
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+
+    print(f"{'size':>7} {'people':>6} {'engine':<12} {'time (s)':>9} "
+          f"{'max diff':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for depth, width in SIZES:
+            filename = os.path.join(directory, f"{depth}x{width}.csv")
+            with open(filename, "w") as f:
+                f.write(generate_pedigree(depth, width, observed, rng=rng))
+            people = load_data(filename)
+
+            reference = None
+            for name, engine in BENCHMARKS.items():
+                if len(people) > MAX_PEOPLE.get(name, len(people)):
+                    continue
+                start = time.perf_counter()
+                probabilities = engine(people)
+                elapsed = time.perf_counter() - start
+
+                if reference is None:
+                    reference = probabilities
+                diff = difference(probabilities, reference)
+                if name not in APPROXIMATE and diff > TOLERANCE:
+                    sys.exit(f"Engine {name} disagrees with the reference "
+                             f"on {depth}x{width} by {diff}")
+                print(f"{depth:>3}x{width:<3} {len(people):>6} {name:<12} "
+                      f"{elapsed:>9.3f} {diff:>9.2e}")
+
+            # Weighting is only checked for its effective sample size,
+            # since its weights collapse on all but the smallest pedigrees
+            ess, sigmas, warned = check_weighting(people, reference)
+            if ess < MIN_ESS and not warned:
+                sys.exit(f"Likelihood weighting collapsed to an effective "
+                         f"sample size of {ess:.1f} on {depth}x{width} "
+                         f"without a warning")
+            if not warned and sigmas > SIGMAS:
+                sys.exit(f"Likelihood weighting is off by {sigmas:.1f} "
+                         f"standard errors on {depth}x{width}, with an "
+                         f"effective sample size of {ess:.1f}")
+            print(f"{depth:>3}x{width:<3} {len(people):>6} {'weighting':<12} "
+                  f"{'ess':>9} {ess:>9.1f}{' (collapsed)' if warned else ''}")
+
+
+def generate_pedigree(depth, width, observed=OBSERVED, loops=LOOPS,
+                      rng=random):
+    """
+    Return the text of a random family CSV, with fields name, mother,
+    father and trait, spanning `depth` generations of `width` people.
+
+    Each person of a generation has children with someone from outside
+    the family, or with probability `loops` with another person of their
+    generation, closing a loop in the pedigree. Each person of the next
+    generation is a child of one of those couples. Every person's trait
+    is known, and drawn at random, with probability `observed`.
+    """
+    rows = []
+
+    def add(mother=None, father=None):
+        name = f"P{len(rows)}"
+        if rng.random() < observed:
+            trait = rng.choice(["0", "1"])
+        else:
+            trait = ""
+        rows.append(",".join([name, mother or "", father or "", trait]))
+        return name
+
+    generation = [add() for _ in range(width)]
+    for _ in range(depth - 1):
+        unpaired = list(generation)
+        rng.shuffle(unpaired)
+        couples = []
+        while unpaired:
+            mother = unpaired.pop()
+            if unpaired and rng.random() < loops:
+                father = unpaired.pop()
+            else:
+                father = add()
+            couples.append((mother, father))
+        generation = [add(*rng.choice(couples)) for _ in range(width)]
+
+    return "\n".join(["name,mother,father,trait"] + rows) + "\n"
+
+
+def check_weighting(people, reference):
+    """
+    Run seeded likelihood weighting on `people` and return its effective
+    sample size, its largest difference from the `reference` in units of
+    its largest standard error, and whether it warned that it collapsed.
+
+    On large pedigrees the weights collapse onto a few samples and the
+    delta-method errors shrink towards 0 while the estimates are far off,
+    so such a run must warn rather than report errors that look precise.
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", RuntimeWarning)
+        probabilities, errors, diagnostics = sample_probabilities(
+            people, SAMPLES, seed=0, method="weighting"
+        )
+    warned = any(issubclass(w.category, RuntimeWarning) for w in caught)
+    error = max(
+        errors[person][field][value]
+        for person in errors
+        for field in errors[person]
+        for value in errors[person][field]
+    )
+    sigmas = difference(probabilities, reference) / error
+    return diagnostics["ess"], sigmas, warned
+
+
+def difference(probabilities, reference):
+    """Return the largest difference between two sets of probabilities."""
+    return max(
+        abs(probabilities[person][field][value] -
+            reference[person][field][value])
+        for person in reference
+        for field in reference[person]
+        for value in reference[person][field]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import functools
+import itertools
+import sys
+
+from heredity import PROBS, inheritance, load_data
+
+# Numbers of copies of the gene a person can have
+GENES = (2, 1, 0)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python elimination.py data.csv")
+    people = load_data(sys.argv[1])
+    probabilities = marginals(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+class Factor():
+
+    def __init__(self, variables, table):
+        """
+        Create a factor over `variables`, a tuple of names, where `table`
+        maps each tuple of gene counts, one per variable, to a value.
+        """
+        self.variables = variables
+        self.table = table
+
+    def multiply(self, other):
+        """Return the product of this factor and `other`."""
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        mine = [variables.index(v) for v in self.variables]
+        theirs = [variables.index(v) for v in other.variables]
+        table = dict()
+        for values in itertools.product(GENES, repeat=len(variables)):
+            table[values] = (
+                self.table[tuple(values[k] for k in mine)] *
+                other.table[tuple(values[k] for k in theirs)]
+            )
+        return Factor(variables, table)
+
+    def divide(self, other):
+        """
+        Return this factor divided by `other`, whose variables must all be
+        variables of this factor, taking 0 / 0 to be 0.
+        """
+        theirs = [self.variables.index(v) for v in other.variables]
+        table = dict()
+        for values, p in self.table.items():
+            q = other.table[tuple(values[k] for k in theirs)]
+            table[values] = p / q if q else 0
+        return Factor(self.variables, table)
+
+    def marginal(self, variables):
+        """Return the sum of this factor over variables not in `variables`."""
+        factor = self
+        for v in self.variables:
+            if v not in variables:
+                factor = factor.sum_out(v)
+        return factor
+
+    def sum_out(self, variable):
+        """Return this factor with `variable` summed out."""
+        k = self.variables.index(variable)
+        variables = self.variables[:k] + self.variables[k + 1:]
+        table = dict()
+        for values, p in self.table.items():
+            key = values[:k] + values[k + 1:]
+            table[key] = table.get(key, 0) + p
+        return Factor(variables, table)
+
+
+def network(people, evidence=True):
+    """
+    Return list of factors over the number of genes of each person: one
+    per person for how their genes arise, times the probability of their
+    trait if it is known and `evidence` is True.
+    """
+    inherited = inheritance()
+    factors = []
+    for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        likelihood = trait_likelihood(
+            people[person]["trait"] if evidence else None
+        )
+        if mother is None and father is None:
+            factors.append(Factor((person,), {
+                (g,): PROBS["gene"][g] * likelihood[g] for g in GENES
+            }))
+        else:
+            factors.append(Factor((person, mother, father), {
+                (g, m, f): inherited[m, f][g] * likelihood[g]
+                for g in GENES for m in GENES for f in GENES
+            }))
+    return factors
+
+
+@functools.lru_cache(maxsize=None)
+def trait_likelihood(trait):
+    """
+    Return dict mapping each number of genes to the probability of the
+    observed `trait`, or to 1 if the trait is unknown (None). The dict
+    is shared between calls, so it must not be modified.
+    """
+    return {
+        g: 1 if trait is None else PROBS["trait"][g][trait] for g in GENES
+    }
+
+
+def elimination_order(factors):
+    """
+    Return an order in which to eliminate every variable, choosing each
+    time the variable whose elimination adds the fewest new edges
+    between variables that share a factor (min-fill).
+    """
+    neighbors = dict()
+    for factor in factors:
+        for v in factor.variables:
+            neighbors.setdefault(v, set()).update(factor.variables)
+    for v in neighbors:
+        neighbors[v].discard(v)
+
+    def fill(v):
+        adjacent = list(neighbors[v])
+        return sum(
+            1 for a, b in itertools.combinations(adjacent, 2)
+            if b not in neighbors[a]
+        )
+
+    order = []
+    while neighbors:
+        v = min(neighbors, key=lambda v: (fill(v), len(neighbors[v])))
+        for a in neighbors[v]:
+            neighbors[a].update(neighbors[v] - {a})
+            neighbors[a].discard(v)
+        del neighbors[v]
+        order.append(v)
+    return order
+
+
+def eliminate(factors, order):
+    """
+    Sum the variables in `order` out of the product of `factors`, one at
+    a time, and return the product of the factors that remain.
+    """
+    factors = list(factors)
+    for v in order:
+        involved = [f for f in factors if v in f.variables]
+        if not involved:
+            continue
+        factors = [f for f in factors if v not in f.variables]
+        product = involved[0]
+        for f in involved[1:]:
+            product = product.multiply(f)
+        factors.append(product.sum_out(v))
+    result = Factor((), {(): 1})
+    for f in factors:
+        result = result.multiply(f)
+    return result
+
+
+def marginals(people):
+    """
+    Return the gene and trait distribution of every person, conditioned on
+    the known traits, computed exactly by variable elimination. The
+    result has the same structure as the `probabilities` of heredity.py.
+
+    Each person is a separate query that eliminates everyone else from
+    scratch, so the cost grows with the square of the pedigree's size.
+    junction.JunctionTree computes every marginal in one collect and one
+    distribute pass, reusing the intermediate factors, and should be
+    preferred for more than a few dozen people.
+    """
+    factors = network(people)
+    order = elimination_order(factors)
+
+    probabilities = dict()
+    for person in people:
+        result = eliminate(factors, [v for v in order if v != person])
+        total = sum(result.table.values())
+        gene = {g: result.table[(g,)] / total for g in GENES}
+
+        probabilities[person] = distributions(gene, people[person]["trait"])
+    return probabilities
+
+
+def distributions(gene, trait):
+    """
+    Return a person's entry of `probabilities` given their normalized gene
+    distribution and their known trait, or None if it is unknown.
+    """
+    if trait is None:
+        has_trait = sum(gene[g] * PROBS["trait"][g][True] for g in GENES)
+    else:
+        has_trait = 1.0 if trait else 0.0
+    return {
+        "gene": gene,
+        "trait": {True: has_trait, False: 1 - has_trait}
+    }
+
+
+if __name__ == "__main__":
+    main()
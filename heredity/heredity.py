@@ -1,5 +1,7 @@
 import csv
+import functools
 import itertools
+import math
 import sys
 
 PROBS = {
@@ -45,54 +47,169 @@ def main():
     # people = load_data(sys.argv[1])
     people = load_data('data/family0.csv')
 
-    # Keep track of gene and trait probabilities for each person
+    # Compute gene and trait probabilities for each person
+    probabilities = enumerate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people, log=False):
+    """
+    Return the normalized gene and trait distribution of every person by
+    enumerating every assignment of genes, and of traits to the people
+    whose trait is unknown.
+
+    Known traits are never enumerated: their probability only depends on
+    the genes, so it is multiplied in once per gene assignment. All
+    assignments are generated lazily, so memory use does not grow with
+    the number of assignments.
+
+    If `log` is True, probabilities are accumulated as logs, so that
+    large families cannot underflow to a total of 0.
+    """
+
+    # Keep track of gene and trait probabilities (or their logs)
+    empty = -math.inf if log else 0
     probabilities = {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: empty,
+                1: empty,
+                0: empty
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: empty,
+                False: empty
             }
         }
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
     names = set(people)
-    for have_trait in powerset(names):
+    unknown = [person for person in people if people[person]["trait"] is None]
+    known_trait = set(person for person in people if people[person]["trait"])
+
+    # Loop over all sets of people who might have the gene
+    for one_gene, two_genes in gene_assignments(names):
+
+        # Probability of the genes and the known traits
+        base = gene_probability(people, one_gene, two_genes, log)
+        for person in names:
+            if people[person]["trait"] is not None:
+                base = combine(base, PROBS["trait"][
+                    gene_count(person, one_gene, two_genes)
+                ][people[person]["trait"]], log)
+
+        # Loop over all sets of people with unknown traits who might have it
+        for have_unknown in subsets(unknown):
+            p = base
+            for person in unknown:
+                p = combine(p, PROBS["trait"][
+                    gene_count(person, one_gene, two_genes)
+                ][person in have_unknown], log)
+            update(probabilities, one_gene, two_genes,
+                   known_trait | have_unknown, p, log)
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Ensure probabilities sum to 1
+    normalize(probabilities, log)
+    return probabilities
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+def vectorized_probabilities(people):
+    """
+    Return the same distributions as `enumerate_probabilities`, computed
+    with NumPy over an array holding every gene assignment at once.
+
+    Row r of the assignment array gives each person's number of genes,
+    the base-3 digits of r. Joint probabilities are gathered from the
+    prior, inheritance and trait tables one person (column) at a time,
+    and updating and normalizing become weighted sums over the rows.
+    Unknown traits are summed out per person, which is what enumerating
+    them and then updating amounts to.
+    """
+    import numpy as np
+
+    names = list(people)
+    column = {name: k for k, name in enumerate(names)}
+    rows = np.arange(3 ** len(names))
+    genes = [(rows // 3 ** k % 3).astype(np.int8) for k in range(len(names))]
+
+    # Tables indexed by numbers of genes
+    prior = np.array([PROBS["gene"][g] for g in (0, 1, 2)])
+    inherited = inheritance()
+    child = np.array([
+        [[inherited[m, f][g] for g in (0, 1, 2)] for f in (0, 1, 2)]
+        for m in (0, 1, 2)
+    ])
+    trait = np.array([
+        [PROBS["trait"][g][False], PROBS["trait"][g][True]] for g in (0, 1, 2)
+    ])
+
+    # Joint probability of each gene assignment and the known traits
+    p = np.ones(len(rows))
+    for k, name in enumerate(names):
+        mother = people[name]["mother"]
+        father = people[name]["father"]
+        if mother is None and father is None:
+            p *= prior[genes[k]]
+        else:
+            p *= child[genes[column[mother]], genes[column[father]], genes[k]]
+        if people[name]["trait"] is not None:
+            p *= trait[genes[k], int(people[name]["trait"])]
+
+    probabilities = dict()
+    for k, name in enumerate(names):
+        gene = np.bincount(genes[k], weights=p, minlength=3)
+        if people[name]["trait"] is None:
+            has_trait = float(np.dot(p, trait[genes[k], 1]))
+        else:
+            has_trait = float(p.sum()) if people[name]["trait"] else 0.0
+        probabilities[name] = {
+            "gene": {g: float(gene[g]) for g in (2, 1, 0)},
+            "trait": {True: has_trait, False: float(p.sum()) - has_trait}
+        }
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
+
+
+def gene_assignments(names):
+    """
+    Yield every way to split `names` into a set with one copy of the gene
+    and a set with two copies, as tuples (one_gene, two_genes).
+    """
+    names = list(names)
+    for counts in itertools.product((0, 1, 2), repeat=len(names)):
+        yield (
+            set(name for name, n in zip(names, counts) if n == 1),
+            set(name for name, n in zip(names, counts) if n == 2)
+        )
+
+
+def subsets(names):
+    """
+    Yield every subset of the list `names`, counting through the bit masks
+    of its length instead of building the power set.
+    """
+    for mask in range(1 << len(names)):
+        yield set(name for k, name in enumerate(names) if mask >> k & 1)
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def gene_count(person, one_gene, two_genes):
+    """Return number of copies of the gene `person` has."""
+    if person in one_gene:
+        return 1
+    elif person in two_genes:
+        return 2
+    return 0
 
 
 def load_data(filename):
@@ -129,7 +246,7 @@ def powerset(s):
     ]
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait, log=False):
     """
     Compute and return a joint probability.
 
@@ -139,24 +256,31 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    If `log` is True, return the natural log of the probability instead.
     """
-    
-    prob = 1
+    prob = gene_probability(people, one_gene, two_genes, log)
+    for person in people:
+        numGenes = gene_count(person, one_gene, two_genes)
+        prob = combine(prob, PROBS["trait"][numGenes][person in have_trait],
+                       log)
+    return prob
+
+
+def gene_probability(people, one_gene, two_genes, log=False):
+    """
+    Return the probability that everyone in `one_gene` has one copy of
+    the gene, everyone in `two_genes` has two and everyone else has none,
+    or its natural log if `log` is True.
+    """
+    prob = 0 if log else 1
     for person in people:
         # calculate parent probability
         father = people[person]["father"]
         mother = people[person]["mother"]
 
-        trait = False
-        if person in have_trait:
-            trait = True
-    
-        numGenes = 0
-        if person in one_gene:
-            numGenes = 1
-        elif person in two_genes:
-            numGenes = 2
-        
+        numGenes = gene_count(person, one_gene, two_genes)
+
         person_prob = 0
         if father is None and mother is None:
             person_prob = PROBS["gene"][numGenes]
@@ -172,25 +296,77 @@ def joint_probability(people, one_gene, two_genes, have_trait):
                 person_prob = parent_probs[mother] * parent_probs[father]
             else:
                 person_prob = (1 - parent_probs[mother]) * (1 - parent_probs[father])
-        person_prob *= PROBS["trait"][numGenes][trait]
-        prob *= person_prob
+        prob = combine(prob, person_prob, log)
     return prob
 
+
+def combine(prob, factor, log=False):
+    """
+    Return `prob` times the probability `factor`, or if `log` is True the
+    log probability `prob` plus the log of `factor`.
+    """
+    if not log:
+        return prob * factor
+    return prob + math.log(factor) if factor > 0 else -math.inf
+
+
+def log_add(a, b):
+    """Return log(exp(a) + exp(b)) without leaving log space."""
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
 def calc_parent_prob(parent, one_gene, two_genes):
-    prob = PROBS["mutation"]
     if parent in one_gene:
-        prob = 0.5
+        return pass_probability(1)
     elif parent in two_genes:
-        prob = (1 - PROBS["mutation"])
+        return pass_probability(2)
+    return pass_probability(0)
+
+
+def pass_probability(genes):
+    """
+    Return probability that a parent with `genes` copies of the gene
+    passes one on to a child.
+    """
+    if genes == 1:
+        return 0.5
+    elif genes == 2:
+        return 1 - PROBS["mutation"]
+    return PROBS["mutation"]
 
-    return prob
 
-def update(probabilities, one_gene, two_genes, have_trait, p):
+@functools.lru_cache(maxsize=None)
+def inheritance():
+    """
+    Return dict mapping (mother genes, father genes) to a dict with the
+    probability of the child having each number of genes. The table is
+    computed once per process and shared, so it must not be modified.
+    """
+    table = dict()
+    for mother in (0, 1, 2):
+        for father in (0, 1, 2):
+            m = pass_probability(mother)
+            f = pass_probability(father)
+            table[mother, father] = {
+                2: m * f,
+                1: m * (1 - f) + f * (1 - m),
+                0: (1 - m) * (1 - f)
+            }
+    return table
+
+def update(probabilities, one_gene, two_genes, have_trait, p, log=False):
     """
     Add to `probabilities` a new joint probability `p`.
     Each per  son should have their "gene" and "trait" distributions updated.
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
+
+    If `log` is True, `probabilities` holds logs of sums and `p` is a log
+    probability, added with log-sum-exp.
     """
     for person in probabilities:
         numGenes = 0
@@ -199,14 +375,41 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         elif person in two_genes:
             numGenes = 2
 
+        if log:
+            gene = probabilities[person]["gene"]
+            trait = probabilities[person]["trait"]
+            gene[numGenes] = log_add(gene[numGenes], p)
+            trait[person in have_trait] = log_add(
+                trait[person in have_trait], p
+            )
+            continue
+
         probabilities[person]["gene"][numGenes] += p
         probabilities[person]["trait"][person in have_trait] += p
 
-def normalize(probabilities):
+def normalize(probabilities, log=False):
     """
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
+
+    If `log` is True, `probabilities` holds logs, which are shifted by
+    their largest value before being exponentiated, so the sum is never
+    0; the result holds ordinary probabilities.
     """
+    if log:
+        for person in probabilities:
+            for field in ("gene", "trait"):
+                logs = probabilities[person][field]
+                top = max(logs.values())
+                if top == -math.inf:
+                    raise ValueError(f"{person} has no possible {field}")
+                weights = {k: math.exp(v - top) for k, v in logs.items()}
+                total = sum(weights.values())
+                probabilities[person][field] = {
+                    k: w / total for k, w in weights.items()
+                }
+        return
+
     for person in probabilities:
         factor = 1.0 / sum(probabilities[person]["gene"].values())
         probabilities[person]["gene"] = { k: v*factor for k, v in probabilities[person]["gene"].items() }
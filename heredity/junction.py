@@ -0,0 +1,248 @@
+import itertools
+import math
+import sys
+
+from heredity import load_data
+from elimination import (
+    GENES, Factor, distributions, elimination_order, network,
+    trait_likelihood
+)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python junction.py data.csv")
+    people = load_data(sys.argv[1])
+    tree = JunctionTree(people)
+    probabilities = tree.marginals()
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+class JunctionTree():
+
+    def __init__(self, people):
+        """
+        Build a junction tree over the number of genes of each person and
+        calibrate it, so that every clique holds the joint distribution of
+        its people with the known traits.
+
+        Loops in the pedigree, such as marriages between relatives, are
+        handled exactly: they only make the cliques larger.
+
+        Beliefs and messages are kept normalized so large pedigrees cannot
+        underflow; the probability of the known traits they were scaled
+        by is kept as a log in `log_evidence`.
+        """
+        self.people = people
+        self.traits = {
+            person: people[person]["trait"] for person in people
+        }
+        factors = network(people, evidence=False)
+
+        self.cliques = cliques(factors)
+        self.edges = spanning_tree(self.cliques)
+        self.adjacent = {k: [] for k in range(len(self.cliques))}
+        for a, b in self.edges:
+            self.adjacent[a].append(b)
+            self.adjacent[b].append(a)
+
+        # Give each factor and each person's trait to one clique covering it
+        self.home = dict()
+        self.beliefs = [
+            Factor(clique, {
+                values: 1
+                for values in itertools.product(GENES, repeat=len(clique))
+            })
+            for clique in self.cliques
+        ]
+        for factor in factors:
+            k = self.covering(factor.variables)
+            self.beliefs[k] = self.beliefs[k].multiply(factor)
+        for person in people:
+            self.home[person] = self.covering((person,))
+            likelihood = trait_likelihood(self.traits[person])
+            self.beliefs[self.home[person]] = self.beliefs[
+                self.home[person]
+            ].multiply(Factor((person,), {(g,): likelihood[g] for g in GENES}))
+        self.log_evidence = 0
+        for k, belief in enumerate(self.beliefs):
+            self.beliefs[k], total = normalize(belief)
+            self.log_evidence += math.log(total)
+
+        # Each separator starts out as a factor of ones
+        self.separators = dict()
+        for a, b in self.edges:
+            variables = tuple(
+                v for v in self.cliques[a] if v in self.cliques[b]
+            )
+            self.separators[frozenset((a, b))] = Factor(variables, {
+                values: 1
+                for values in itertools.product(GENES, repeat=len(variables))
+            })
+        self.calibrate()
+
+    def covering(self, variables):
+        """Return index of the smallest clique containing all `variables`."""
+        return min(
+            (k for k, clique in enumerate(self.cliques)
+             if all(v in clique for v in variables)),
+            key=lambda k: len(self.cliques[k])
+        )
+
+    def calibrate(self):
+        """
+        Calibrate every clique in one sweep: collect messages towards the
+        first clique of each tree in the forest, then distribute them back.
+        """
+        visited = set()
+        for root in range(len(self.cliques)):
+            if root in visited:
+                continue
+            order = self.traverse(root)
+            visited.update(k for k, _ in order)
+            for k, parent in reversed(order):
+                if parent is not None:
+                    self.log_evidence += self.send(k, parent)
+            self.distribute(root)
+
+    def traverse(self, root):
+        """
+        Return list of (clique, parent) pairs for the tree containing
+        `root`, in breadth-first order from it.
+        """
+        order = [(root, None)]
+        seen = {root}
+        for k, _ in order:
+            for n in self.adjacent[k]:
+                if n not in seen:
+                    seen.add(n)
+                    order.append((n, k))
+        return order
+
+    def distribute(self, root):
+        """Send messages outward from `root` to every clique in its tree."""
+        for k, parent in self.traverse(root):
+            if parent is not None:
+                self.send(parent, k)
+
+    def send(self, source, target):
+        """
+        Pass a message from clique `source` to clique `target`, scaling the
+        target's belief by the change in their shared separator. Return the
+        log of the total the target's belief was normalized by.
+
+        The source's belief is normalized, so the message is too.
+        """
+        key = frozenset((source, target))
+        message = self.beliefs[source].marginal(self.separators[key].variables)
+        self.beliefs[target], total = normalize(
+            self.beliefs[target].multiply(message.divide(self.separators[key]))
+        )
+        self.separators[key] = message
+        return math.log(total)
+
+    def set_trait(self, person, trait):
+        """
+        Change the known trait of `person` (None if it becomes unknown)
+        and recalibrate the tree by distributing the change from the one
+        clique holding that evidence, rather than rebuilding the tree.
+        """
+        old = trait_likelihood(self.traits[person])
+        new = trait_likelihood(trait)
+        self.traits[person] = trait
+        k = self.home[person]
+        self.beliefs[k], total = normalize(
+            self.beliefs[k].multiply(Factor((person,), {
+                (g,): new[g] / old[g] for g in GENES
+            }))
+        )
+        self.log_evidence += math.log(total)
+        self.distribute(k)
+
+    def marginals(self):
+        """
+        Return the gene and trait distribution of every person, conditioned
+        on the known traits. The result has the same structure as the
+        `probabilities` of heredity.py.
+        """
+        probabilities = dict()
+        for person in self.people:
+            belief = self.beliefs[self.home[person]].marginal((person,))
+            total = sum(belief.table.values())
+            gene = {g: belief.table[(g,)] / total for g in GENES}
+            probabilities[person] = distributions(gene, self.traits[person])
+        return probabilities
+
+
+def normalize(factor):
+    """
+    Return `factor` scaled so its values sum to 1, and the sum it was
+    divided by.
+    """
+    total = sum(factor.table.values())
+    if total == 0:
+        raise ValueError("the known traits are impossible")
+    return Factor(factor.variables, {
+        values: p / total for values, p in factor.table.items()
+    }), total
+
+
+def cliques(factors):
+    """
+    Return list of the maximal cliques, as tuples of variables, formed
+    by eliminating the variables of `factors` in min-fill order.
+    """
+    neighbors = dict()
+    for factor in factors:
+        for v in factor.variables:
+            neighbors.setdefault(v, set()).update(factor.variables)
+
+    found = []
+    for v in elimination_order(factors):
+        clique = neighbors[v]
+        for a in clique - {v}:
+            neighbors[a].update(clique)
+            neighbors[a].discard(v)
+        del neighbors[v]
+        if not any(clique <= other for other in found):
+            found.append(clique)
+    return [tuple(sorted(clique)) for clique in found]
+
+
+def spanning_tree(cliques):
+    """
+    Return list of edges (pairs of clique indexes) of a spanning forest
+    that maximizes the number of variables shared along its edges, which
+    gives a junction tree for cliques formed by elimination.
+    """
+    candidates = sorted(
+        ((len(set(cliques[a]) & set(cliques[b])), a, b)
+         for a, b in itertools.combinations(range(len(cliques)), 2)),
+        reverse=True
+    )
+    component = list(range(len(cliques)))
+
+    def find(k):
+        while component[k] != k:
+            component[k] = component[component[k]]
+            k = component[k]
+        return k
+
+    edges = []
+    for shared, a, b in candidates:
+        if shared and find(a) != find(b):
+            component[find(a)] = find(b)
+            edges.append((a, b))
+    return edges
+
+
+if __name__ == "__main__":
+    main()
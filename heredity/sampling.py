@@ -0,0 +1,375 @@
+import concurrent.futures
+import functools
+import sys
+import warnings
+
+from heredity import PROBS, inheritance, load_data
+
+# Samples drawn at once by a weighting chain, bounding its memory use
+BATCH = 10000
+
+# Gibbs samplers run side by side in each chain
+WALKERS = 200
+
+# Extra sweeps a Gibbs sampler runs first and discards, as a fraction
+# of the sweeps it keeps, but at least MIN_BURN_IN of them
+BURN_IN = 0.2
+MIN_BURN_IN = 100
+
+# Effective sample size below which likelihood weighting warns that a
+# few samples carry nearly all the weight and its errors are inflated
+MIN_ESS = 1000
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4, 5]:
+        sys.exit(
+            "Usage: python sampling.py data.csv [samples] [seed] [method]"
+        )
+    people = load_data(sys.argv[1])
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    method = sys.argv[4] if len(sys.argv) > 4 else "gibbs"
+    probabilities, errors, diagnostics = sample_probabilities(
+        people, samples, seed, method
+    )
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                e = errors[person][field][value]
+                print(f"    {value}: {p:.4f} ± {e:.4f}")
+    if "ess" in diagnostics:
+        print(f"Effective sample size: {diagnostics['ess']:.1f}")
+
+
+def sample_probabilities(people, samples=100000, seed=None, method="gibbs",
+                         chains=4, workers=None):
+    """
+    Estimate the gene and trait distribution of every person, conditioned
+    on the known traits, from `samples` samples of everyone's genes.
+
+    `method` is "gibbs", which resamples one person at a time given their
+    parents, children and mates and suits pedigrees with many known
+    traits, or "weighting" (likelihood weighting), which draws everyone
+    from the prior and weights each sample by the known traits, and
+    suits pedigrees with few.
+
+    The samples are split between `chains` independent chains, run in a
+    pool of `workers` processes and seeded from `seed`. Return a tuple of
+    the estimated `probabilities`, in the structure of heredity.py, their
+    standard errors in the same structure, and a dict of diagnostics:
+    for Gibbs, the number of "walkers"; for weighting, the effective
+    sample size "ess", (sum of weights) ** 2 / (sum of squared weights),
+    overall and per chain in "chain_ess".
+
+    When the effective sample size is below MIN_ESS, the weights have
+    collapsed onto a few samples and the delta-method errors are far too
+    small, so a RuntimeWarning is issued and each error is raised to at
+    least 0.5 / sqrt(ess), the largest a proportion can have.
+    """
+    import numpy as np
+
+    if method == "gibbs":
+        run, combine = gibbs_chain, combine_walkers
+    elif method == "weighting":
+        run, combine = weighting_chain, combine_weights
+    else:
+        raise ValueError(f"unknown sampling method {method}")
+
+    if samples < 1:
+        raise ValueError("need at least one sample")
+
+    # Every chain draws at least one sample
+    chains = min(chains, samples)
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    budgets = [
+        samples // chains + (1 if k < samples % chains else 0)
+        for k in range(chains)
+    ]
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers
+    ) as executor:
+        results = list(executor.map(run, [people] * chains, budgets, seeds))
+    mean, error, diagnostics = combine(results)
+
+    probabilities = dict()
+    errors = dict()
+    for k, name in enumerate(people):
+        gene = {g: float(mean[k, g]) for g in (2, 1, 0)}
+        gene_error = {g: float(error[k, g]) for g in (2, 1, 0)}
+        trait = people[name]["trait"]
+        if trait is None:
+            has_trait = float(mean[k, 3])
+            trait_error = float(error[k, 3])
+        else:
+            has_trait = 1.0 if trait else 0.0
+            trait_error = 0.0
+        probabilities[name] = {
+            "gene": gene,
+            "trait": {True: has_trait, False: 1 - has_trait}
+        }
+        errors[name] = {
+            "gene": gene_error,
+            "trait": {True: trait_error, False: trait_error}
+        }
+    return probabilities, errors, diagnostics
+
+
+@functools.lru_cache(maxsize=None)
+def tables():
+    """
+    Return NumPy arrays indexed by numbers of genes: the prior, the child
+    distribution given the mother's and father's genes, the probability
+    of not having and having the trait, all as logs, and the probability
+    of having the trait. They are built once per process.
+    """
+    import numpy as np
+
+    inherited = inheritance()
+    return (
+        np.log([PROBS["gene"][g] for g in (0, 1, 2)]),
+        np.log([
+            [[inherited[m, f][g] for g in (0, 1, 2)] for f in (0, 1, 2)]
+            for m in (0, 1, 2)
+        ]),
+        np.log([
+            [PROBS["trait"][g][False], PROBS["trait"][g][True]]
+            for g in (0, 1, 2)
+        ]),
+        np.array([PROBS["trait"][g][True] for g in (0, 1, 2)])
+    )
+
+
+def draw(rng, log_p):
+    """
+    Return one number of genes for each row of `log_p`, drawn with
+    probabilities proportional to the exponentials of the row.
+    """
+    import numpy as np
+
+    p = np.exp(log_p - log_p.max(axis=-1, keepdims=True))
+    cdf = np.cumsum(p, axis=-1)
+    u = rng.random(cdf.shape[:-1] + (1,)) * cdf[..., -1:]
+    return (u > cdf).sum(axis=-1).astype(np.int8)
+
+
+def forward(people, order, row, rng, size):
+    """
+    Draw `size` samples of everyone's genes from the prior and inheritance
+    tables, parents before children. Return the array of genes, one row
+    per person, and the log probability of the known traits per sample.
+    """
+    import numpy as np
+
+    log_prior, log_child, log_trait, _ = tables()
+    genes = np.empty((len(row), size), dtype=np.int8)
+    log_weights = np.zeros(size)
+    for name in order:
+        k = row[name]
+        mother = people[name]["mother"]
+        father = people[name]["father"]
+        if mother is None and father is None:
+            genes[k] = draw(rng, np.broadcast_to(log_prior, (size, 3)))
+        else:
+            genes[k] = draw(
+                rng, log_child[genes[row[mother]], genes[row[father]]]
+            )
+        if people[name]["trait"] is not None:
+            log_weights += log_trait[genes[k], int(people[name]["trait"])]
+    return genes, log_weights
+
+
+def weighting_chain(people, samples, seed):
+    """
+    Draw `samples` weighted samples of everyone's genes in batches.
+
+    Return a tuple (shift, sums) where `sums` maps "w", "wy", "w2", "w2y"
+    and "w2y2" to sums of the weights w, scaled by exp(-shift), and their
+    squares, times each person's indicator of having 0, 1 or 2 genes and
+    their probability of having the trait (y, one column each). The shift
+    is the largest log weight seen, or None if no samples were drawn.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    row = {name: k for k, name in enumerate(people)}
+    order = ancestral_order(people)
+    has_trait = tables()[3]
+
+    shift = None
+    sums = None
+    while samples > 0:
+        size = min(samples, BATCH)
+        samples -= size
+        genes, log_weights = forward(people, order, row, rng, size)
+
+        # Rescale this batch and the sums so far to the largest log weight
+        top = float(log_weights.max())
+        if shift is None or top > shift:
+            if sums is not None:
+                sums = rescale(sums, np.exp(shift - top))
+            shift = top
+        w = np.exp(log_weights - shift)
+
+        y = np.concatenate([
+            (genes[:, :, None] == np.arange(3)).astype(float),
+            has_trait[genes][:, :, None]
+        ], axis=2)
+        batch = {
+            "w": w.sum(),
+            "wy": np.einsum("s,nsc->nc", w, y),
+            "w2": (w ** 2).sum(),
+            "w2y": np.einsum("s,nsc->nc", w ** 2, y),
+            "w2y2": np.einsum("s,nsc->nc", w ** 2, y ** 2)
+        }
+        sums = batch if sums is None else {
+            key: sums[key] + batch[key] for key in sums
+        }
+    return shift, sums
+
+
+def rescale(sums, scale):
+    """Return weight `sums` multiplied by `scale` (squared weights twice)."""
+    return {
+        key: sums[key] * scale ** (2 if key.startswith("w2") else 1)
+        for key in sums
+    }
+
+
+def combine_weights(results):
+    """
+    Return the self-normalized estimates from the sums of weighting chains,
+    their delta-method standard errors, inflated if the weights collapsed,
+    and the effective sample sizes.
+    """
+    import numpy as np
+
+    shift = max(s for s, _ in results if s is not None)
+    totals = None
+    chain_ess = []
+    for s, sums in results:
+        if s is None:
+            continue
+        chain_ess.append(float(sums["w"] ** 2 / sums["w2"]))
+        sums = rescale(sums, np.exp(s - shift))
+        totals = sums if totals is None else {
+            key: totals[key] + sums[key] for key in totals
+        }
+    ess = float(totals["w"] ** 2 / totals["w2"])
+
+    mean = totals["wy"] / totals["w"]
+    variance = (
+        totals["w2y2"] - 2 * mean * totals["w2y"] + mean ** 2 * totals["w2"]
+    ) / totals["w"] ** 2
+    error = np.sqrt(np.maximum(variance, 0))
+    if ess < MIN_ESS:
+        warnings.warn(
+            f"likelihood weighting has an effective sample size of only "
+            f"{ess:.1f}; its estimates are unreliable, try method='gibbs'",
+            RuntimeWarning, stacklevel=3
+        )
+        error = np.maximum(error, 0.5 / np.sqrt(ess))
+    return mean, error, {"ess": ess, "chain_ess": chain_ess}
+
+
+def gibbs_chain(people, samples, seed):
+    """
+    Run up to WALKERS Gibbs samplers side by side for `samples` samples
+    in total, after discarding BURN_IN (or MIN_BURN_IN) extra sweeps.
+
+    Each sweep resamples every person given their parents, their trait
+    and their children with their mates. Rather than count the genes
+    drawn, each walker averages the distributions they are drawn from.
+    Return a tuple of the sums over walkers of those averages and of
+    their squares, one row per person and one column each for 0, 1 and
+    2 genes and having the trait, and the number of walkers.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    row = {name: k for k, name in enumerate(people)}
+    order = ancestral_order(people)
+    log_prior, log_child, log_trait, has_trait = tables()
+
+    walkers = max(1, min(samples, WALKERS))
+    sweeps = -(-samples // walkers)
+    burn_in = max(int(sweeps * BURN_IN), MIN_BURN_IN)
+
+    children = {name: [] for name in people}
+    for name in people:
+        mother = people[name]["mother"]
+        father = people[name]["father"]
+        if mother is not None:
+            children[mother].append((row[name], "mother", row[father]))
+            children[father].append((row[name], "father", row[mother]))
+
+    genes, _ = forward(people, order, row, rng, walkers)
+    totals = np.zeros((len(row), walkers, 4))
+    for sweep in range(burn_in + sweeps):
+        for name in order:
+            k = row[name]
+            mother = people[name]["mother"]
+            father = people[name]["father"]
+            if mother is None and father is None:
+                log_p = np.broadcast_to(log_prior, (walkers, 3))
+            else:
+                log_p = log_child[genes[row[mother]], genes[row[father]]]
+            if people[name]["trait"] is not None:
+                log_p = log_p + log_trait[:, int(people[name]["trait"])]
+            for child, role, mate in children[name]:
+                if role == "mother":
+                    log_p = log_p + log_child[:, genes[mate], genes[child]].T
+                else:
+                    log_p = log_p + log_child[genes[mate], :, genes[child]]
+
+            genes[k] = draw(rng, log_p)
+            if sweep >= burn_in:
+                p = np.exp(log_p - log_p.max(axis=1, keepdims=True))
+                p /= p.sum(axis=1, keepdims=True)
+                totals[k, :, :3] += p
+                totals[k, :, 3] += p @ has_trait
+
+    means = totals / sweeps
+    return means.sum(axis=1), (means ** 2).sum(axis=1), walkers
+
+
+def combine_walkers(results):
+    """
+    Return the average over all Gibbs walkers of their estimates, and its
+    standard error from the spread between walkers.
+    """
+    import numpy as np
+
+    total = sum(r[0] for r in results)
+    squares = sum(r[1] for r in results)
+    walkers = sum(r[2] for r in results)
+    mean = total / walkers
+    variance = (squares / walkers - mean ** 2) / max(walkers - 1, 1)
+    return mean, np.sqrt(np.maximum(variance, 0)), {"walkers": walkers}
+
+
+def ancestral_order(people):
+    """Return list of the people ordered so parents precede children."""
+    order = []
+    placed = set()
+
+    def place(name):
+        if name is None or name in placed:
+            return
+        placed.add(name)
+        place(people[name]["mother"])
+        place(people[name]["father"])
+        order.append(name)
+
+    for name in people:
+        place(name)
+    return order
+
+
+if __name__ == "__main__":
+    main()
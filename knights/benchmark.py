@@ -0,0 +1,151 @@
+import random
+import sys
+import time
+import tracemalloc
+
+import logic
+from logic import *
+
+# Speakers per puzzle in a default run
+SIZES = [2, 3, 4, 5, 6, 7, 8]
+
+# Puzzles generated per size
+PUZZLES = 3
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [max_speakers] [seed]")
+    sizes = SIZES
+    if len(sys.argv) > 1:
+        sizes = list(range(2, int(sys.argv[1]) + 1))
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+
+    engines = {
+        "model_check": model_check,
+        "enumerate_models": enumeration_check
+    }
+
+    print(f"{'n':>3} {'engine':<18} {'time (s)':>10} "
+          f"{'nodes':>10} {'peak (KiB)':>11}")
+    for n in sizes:
+        puzzles = [generate_puzzle(n, rng=rng) for _ in range(PUZZLES)]
+        for name, engine in engines.items():
+            elapsed, nodes, peak = 0, 0, 0
+            for knowledge, symbols, solution in puzzles:
+                stats = run(engine, knowledge, symbols)
+
+                # With a unique model, exactly its true symbols are entailed
+                expected = [solution[symbol.name] for symbol in symbols]
+                if stats["answers"] != expected:
+                    sys.exit(f"{name} gave a wrong answer for n = {n}")
+                elapsed += stats["time"]
+                nodes += stats["nodes"]
+                peak = max(peak, stats["peak"])
+            print(f"{n:>3} {name:<18} {elapsed:>10.4f} "
+                  f"{nodes:>10} {peak / 1024:>11.1f}")
+
+
+def generate_puzzle(n, depth=2, rng=random):
+    """
+    Generate a random knights-and-knaves puzzle with `n` speakers whose
+    solution is unique.
+
+    Each speaker makes one statement about the speakers, built from claims
+    such as "B is a knave", combined with And, Or and Not, or reporting
+    what another speaker says, up to `depth` levels deep.
+
+    Return a tuple (knowledge, symbols, solution) where `symbols` lists
+    every Knight and Knave symbol and `solution` is the only model of
+    `knowledge`.
+    """
+    names = [speaker_name(i) for i in range(n)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    symbols = [s for pair in zip(knights, knaves) for s in pair]
+
+    # Every speaker is exactly one of knight or knave
+    general = []
+    for knight, knave in zip(knights, knaves):
+        general.append(Or(knight, knave))
+        general.append(Not(And(knight, knave)))
+
+    def statement(level):
+        """Return a random statement nested at most `level` deep."""
+        i = rng.randrange(n)
+        if level == 0 or rng.random() < 0.3:
+            return rng.choice((knights[i], knaves[i]))
+        kind = rng.choice(("and", "or", "not", "says"))
+        if kind == "not":
+            return Not(statement(level - 1))
+        if kind == "says":
+            return Biconditional(knights[i], statement(level - 1))
+        operands = [statement(level - 1) for _ in range(rng.randint(2, 3))]
+        return And(*operands) if kind == "and" else Or(*operands)
+
+    # Draw statements until exactly one assignment is consistent
+    while True:
+        knowledge = And(*general, *(
+            Biconditional(knight, statement(depth)) for knight in knights
+        ))
+        if count_models(knowledge) == 1:
+            solution = next(enumerate_models(knowledge))
+            return knowledge, symbols, solution
+
+
+def speaker_name(i):
+    """Return a speaker name A, B, ..., Z, A1, B1, ..."""
+    letter = chr(ord("A") + i % 26)
+    return letter if i < 26 else f"{letter}{i // 26}"
+
+
+def enumeration_check(knowledge, query):
+    """Check entailment by testing query in every model of knowledge."""
+    return all(query.evaluate(model) for model in enumerate_models(knowledge))
+
+
+def run(engine, knowledge, symbols):
+    """
+    Ask `engine` whether `knowledge` entails each of `symbols` and return
+    a dict with the answers, the elapsed time, the nodes visited by model
+    checking or model enumeration and the peak memory allocated.
+
+    Tracing allocations and counting nodes slow the search down, so they
+    are done in a second run rather than the timed one.
+    """
+    start = time.perf_counter()
+    answers = [engine(knowledge, symbol) for symbol in symbols]
+    elapsed = time.perf_counter() - start
+
+    nodes = 0
+    searches = {
+        "check_all": logic.check_all,
+        "extend_models": logic.extend_models
+    }
+
+    def counter(search):
+        def counted(*args):
+            nonlocal nodes
+            nodes += 1
+            return search(*args)
+        return counted
+
+    for name, search in searches.items():
+        setattr(logic, name, counter(search))
+    tracemalloc.start()
+    try:
+        for symbol in symbols:
+            engine(knowledge, symbol)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        for name, search in searches.items():
+            setattr(logic, name, search)
+    return {"answers": answers, "time": elapsed, "nodes": nodes, "peak": peak}
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,130 @@
+import concurrent.futures
 import itertools
+import math
+import multiprocessing
+import weakref
 
 
-class Sentence():
+class Interned(type):
+    """
+    Metaclass that hash-conses sentences: constructing an immutable
+    sentence that is structurally equal to a live one returns the
+    existing node.
+
+    Conjunctions and disjunctions can be grown with add(), so they are
+    never shared, and neither is any sentence built on top of one.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        cls._table = weakref.WeakValueDictionary()
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs or cls.mutable or not all(
+            getattr(arg, "_key", None) is not None
+            for arg in args if isinstance(arg, Sentence)
+        ):
+            return super().__call__(*args, **kwargs)
+        try:
+            node = cls._table.get(args)
+        except TypeError:
+            # Unhashable argument, let __init__ report the invalid operand
+            return super().__call__(*args)
+        if node is None:
+            node = super().__call__(*args)
+            node._key = args
+            cls._table[args] = node
+        return node
+
+
+class Sentence(metaclass=Interned):
+
+    __slots__ = ("_key", "_hash", "_symbols", "_formula", "_generation",
+                 "__weakref__")
+
+    # Whether the node can be changed after construction via add()
+    mutable = False
+
+    # Bumped whenever a conjunction or disjunction is mutated, so cached
+    # values of nodes that are not interned are recomputed on next use
+    generation = 0
+
+    def __hash__(self):
+        self._refresh()
+        if self._hash is None:
+            self._hash = self.compute_hash()
+        return self._hash
+
+    def compute_hash(self):
+        return hash(())
+
+    def __reduce__(self):
+        # Rebuild through the constructor so nodes are interned again and
+        # cached hashes are recomputed under the receiving process's seed
+        return (type(self), self.arguments())
+
+    def arguments(self):
+        """Returns the constructor arguments that rebuild the sentence."""
+        return ()
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def partial(self, model):
+        """
+        Evaluates the sentence under a model that may leave symbols
+        unassigned. Returns True or False once the value is decided,
+        or None if it still depends on unassigned symbols.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
+        self._refresh()
+        if self._formula is None:
+            self._formula = self.compute_formula()
+        return self._formula
+
+    def compute_formula(self):
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns the cached frozenset of symbols in the sentence."""
+        self._refresh()
+        if self._symbols is None:
+            self._symbols = self.compute_symbols()
+        return self._symbols
+
+    def compute_symbols(self):
+        return frozenset()
+
+    def _refresh(self):
+        """
+        Drops cached values if any sentence was mutated since. Interned
+        nodes cannot contain a mutable one, so once filled their caches
+        are kept for good.
+        """
+        try:
+            if self._generation in (None, Sentence.generation):
+                return
+        except AttributeError:
+            pass
+        self._hash = None
+        self._symbols = None
+        self._formula = None
+        if getattr(self, "_key", None) is not None:
+            self._generation = None
+        else:
+            self._generation = Sentence.generation
+
+    def _detach(self):
+        """Invalidates cached values before the node is mutated."""
+        Sentence.generation += 1
 
     @classmethod
     def validate(cls, sentence):
@@ -44,15 +155,24 @@ class Sentence():
 
 class Symbol(Sentence):
 
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(("symbol", self.name))
 
+    def arguments(self):
+        return (self.name,)
+
     def __repr__(self):
         return self.name
 
@@ -62,51 +182,81 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
-    def formula(self):
+    def partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
+    def compute_formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def compute_symbols(self):
+        return frozenset((self.name,))
 
 
 class Not(Sentence):
+
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(("not", hash(self.operand)))
 
+    def arguments(self):
+        return (self.operand,)
+
     def __repr__(self):
         return f"Not({self.operand})"
 
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
-    def formula(self):
+    def partial(self, model):
+        value = self.operand.partial(model)
+        return None if value is None else not value
+
+    def compute_formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def compute_symbols(self):
+        return self.operand.symbol_set()
 
 
 class And(Sentence):
+
+    __slots__ = ("conjuncts",)
+
+    mutable = True
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(
             ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
         )
 
+    def arguments(self):
+        return tuple(self.conjuncts)
+
     def __repr__(self):
         conjunctions = ", ".join(
             [str(conjunct) for conjunct in self.conjuncts]
@@ -115,53 +265,98 @@ class And(Sentence):
 
     def add(self, conjunct):
         Sentence.validate(conjunct)
+        self._detach()
         self.conjuncts.append(conjunct)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
-    def formula(self):
+    def partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    def compute_formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def compute_symbols(self):
+        return frozenset().union(
+            *[conjunct.symbol_set() for conjunct in self.conjuncts]
+        )
 
 
 class Or(Sentence):
+
+    __slots__ = ("disjuncts",)
+
+    mutable = True
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(
             ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
         )
 
+    def arguments(self):
+        return tuple(self.disjuncts)
+
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
+    def add(self, disjunct):
+        Sentence.validate(disjunct)
+        self._detach()
+        self.disjuncts.append(disjunct)
+
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
-    def formula(self):
+    def partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    def compute_formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def compute_symbols(self):
+        return frozenset().union(
+            *[disjunct.symbol_set() for disjunct in self.disjuncts]
+        )
 
 
 class Implication(Sentence):
+
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
@@ -169,13 +364,20 @@ class Implication(Sentence):
         self.consequent = consequent
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(("implies", hash(self.antecedent), hash(self.consequent)))
 
+    def arguments(self):
+        return (self.antecedent, self.consequent)
+
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
@@ -183,16 +385,30 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
-    def formula(self):
+    def partial(self, model):
+        antecedent = self.antecedent.partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    def compute_formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def compute_symbols(self):
+        return self.antecedent.symbol_set() | self.consequent.symbol_set()
 
 
 class Biconditional(Sentence):
+
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
@@ -200,13 +416,20 @@ class Biconditional(Sentence):
         self.right = right
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
-    def __hash__(self):
+    __hash__ = Sentence.__hash__
+
+    def compute_hash(self):
         return hash(("biconditional", hash(self.left), hash(self.right)))
 
+    def arguments(self):
+        return (self.left, self.right)
+
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
@@ -216,48 +439,274 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
-    def formula(self):
+    def partial(self, model):
+        left = self.left.partial(model)
+        if left is None:
+            return None
+        right = self.right.partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    def compute_formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def compute_symbols(self):
+        return self.left.symbol_set() | self.right.symbol_set()
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+# Set in pool workers; once set, remaining branches are skipped because
+# another cube has already found a counter-model
+cancelled = None
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+# Levels of the search tree between checks of the cancellation event,
+# since each check takes a lock shared between processes
+POLL_LEVELS = 4
 
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
+def model_check(knowledge, query, workers=None, prefix=None):
+    """
+    Checks if knowledge base entails query.
+
+    If `workers` is greater than 1, the first `prefix` symbols are fixed
+    to split the models into 2 ** prefix disjoint cubes, which are checked
+    in a pool of `workers` processes. `prefix` defaults to enough symbols
+    for a few cubes per worker.
+    """
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    # Get all symbols in both knowledge and query, most frequent first
+    counts = occurrences(knowledge)
+    for symbol, count in occurrences(query).items():
+        counts[symbol] = counts.get(symbol, 0) + count
+    symbols = sorted(counts, key=lambda symbol: (-counts[symbol], symbol))
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
+    # Check that knowledge entails query
+    if workers is None or workers <= 1:
+        return check_all(knowledge, query, symbols, dict())
+    if prefix is None:
+        prefix = math.ceil(math.log2(workers)) + 2
+    prefix = min(prefix, len(symbols))
+    return check_parallel(knowledge, query, symbols, prefix, workers)
+
+
+def check_all(knowledge, query, symbols, model):
+    """Checks if knowledge base entails query, given a particular model."""
+
+    # Another worker already found a counter-model; checked only every
+    # few levels, so at most a small subtree is searched after it is set
+    if (cancelled is not None and len(symbols) % POLL_LEVELS == 0
+            and cancelled.is_set()):
+        return True
+
+    # If knowledge base is already false, every extension entails query
+    known = knowledge.partial(model)
+    if known is False:
+        return True
+
+    # If query is already true, it holds in every extension
+    entailed = query.partial(model)
+    if entailed is True:
+        return True
+
+    # If knowledge base is true, the query decides the branch
+    if known is True and entailed is not None:
+        return entailed
+
+    # If model has an assignment for each symbol
+    if not symbols:
+        return not knowledge.evaluate(model) or query.evaluate(model)
+
+    # Choose the most frequently occurring unused symbol
+    p = symbols[0]
+    remaining = symbols[1:]
+
+    # Ensure entailment holds with the symbol both true and false
+    for value in (True, False):
+        model[p] = value
+        if not check_all(knowledge, query, remaining, model):
+            del model[p]
+            return False
+    del model[p]
+    return True
+
+
+def check_parallel(knowledge, query, symbols, prefix, workers):
+    """
+    Checks entailment by fixing the first `prefix` symbols in every
+    possible way and checking each resulting cube in a process pool.
+    """
+    fixed, remaining = symbols[:prefix], symbols[prefix:]
+    event = multiprocessing.Event()
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=start_worker, initargs=(event,)
+    ) as executor:
+        futures = [
+            executor.submit(check_all, knowledge, query, remaining,
+                            dict(zip(fixed, values)))
+            for values in itertools.product((True, False), repeat=prefix)
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            if not future.result():
+
+                # Stop running cubes and drop the ones not yet started
+                event.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                return False
+    return True
+
+
+def start_worker(event):
+    """Shares the cancellation event with a pool worker."""
+    global cancelled
+    cancelled = event
+
+
+def occurrences(sentence, counts=None):
+    """Returns a dict counting how often each symbol occurs in a sentence."""
+    if counts is None:
+        counts = dict()
+    if isinstance(sentence, Symbol):
+        counts[sentence.name] = counts.get(sentence.name, 0) + 1
+    elif isinstance(sentence, Not):
+        occurrences(sentence.operand, counts)
+    elif isinstance(sentence, And):
+        for conjunct in sentence.conjuncts:
+            occurrences(conjunct, counts)
+    elif isinstance(sentence, Or):
+        for disjunct in sentence.disjuncts:
+            occurrences(disjunct, counts)
+    elif isinstance(sentence, Implication):
+        occurrences(sentence.antecedent, counts)
+        occurrences(sentence.consequent, counts)
+    elif isinstance(sentence, Biconditional):
+        occurrences(sentence.left, counts)
+        occurrences(sentence.right, counts)
+    else:
+        for symbol in sentence.symbol_set():
+            counts[symbol] = counts.get(symbol, 0) + 1
+    return counts
+
+
+def conjuncts_of(knowledge):
+    """Returns the top-level conjuncts of a sentence, flattening nested Ands."""
+    if isinstance(knowledge, And):
+        return [c for conjunct in knowledge.conjuncts
+                for c in conjuncts_of(conjunct)]
+    return [knowledge]
+
+
+def enumerate_models(knowledge):
+    """
+    Yields every model (a dict from symbol name to bool) of the symbols in
+    `knowledge` in which the knowledge base is true.
+
+    Models are produced lazily. After each assignment the conjuncts that
+    mention the symbol are evaluated on the partial model; a branch is
+    abandoned as soon as one of them is false, and conjuncts that are
+    already true are not checked again below it.
+    """
+    conjuncts = conjuncts_of(knowledge)
+
+    # Assign symbols that appear in many conjuncts first so conjuncts are
+    # decided, and can prune, as early as possible
+    counts = dict()
+    for conjunct in conjuncts:
+        for symbol in conjunct.symbol_set():
+            counts[symbol] = counts.get(symbol, 0) + 1
+    order = sorted(counts, key=lambda symbol: (-counts[symbol], symbol))
+
+    pending = []
+    for conjunct in conjuncts:
+        value = conjunct.partial(dict())
+        if value is False:
+            return
+        if value is None:
+            pending.append(conjunct)
+
+    yield from extend_models(order, 0, pending, dict())
+
+
+def extend_models(order, depth, pending, model):
+    """
+    Yields every extension of the partial `model` to the symbols in
+    `order` from `depth` on that makes all `pending` conjuncts true.
+    """
+    if depth == len(order):
+        yield model.copy()
+        return
+    p = order[depth]
+    for value in (True, False):
+        model[p] = value
+        remaining = []
+        for conjunct in pending:
+            if p not in conjunct.symbol_set():
+                remaining.append(conjunct)
+                continue
+            decided = conjunct.partial(model)
+            if decided is False:
+                break
+            if decided is None:
+                remaining.append(conjunct)
+        else:
+            yield from extend_models(order, depth + 1, remaining, model)
+    del model[p]
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+def count_models(knowledge):
+    """
+    Returns the number of models of the symbols in `knowledge` in which the
+    knowledge base is true, without listing them.
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    Conjuncts that share no unassigned symbols are counted independently
+    and their counts multiplied, which is re-checked after every branch.
+    """
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    def components(conjuncts, model):
+        """Groups conjuncts connected through their unassigned symbols."""
+        groups = []
+        for conjunct in conjuncts:
+            free = set(conjunct.symbol_set()) - model.keys()
+            merged = [conjunct]
+            for group in groups[:]:
+                if group[0] & free:
+                    free |= group[0]
+                    merged.extend(group[1])
+                    groups.remove(group)
+            groups.append((free, merged))
+        return groups
+
+    def count(conjuncts, free, model):
+        # Evaluate conjuncts that are fully assigned
+        pending = []
+        for conjunct in conjuncts:
+            if conjunct.symbol_set() <= model.keys():
+                if not conjunct.evaluate(model):
+                    return 0
+            else:
+                pending.append(conjunct)
+
+        total = 1
+        constrained = set()
+        for symbols, group in components(pending, model):
+            constrained |= symbols
+
+            # Branch on the symbol shared by the most conjuncts
+            p = max(sorted(symbols), key=lambda symbol: sum(
+                symbol in conjunct.symbol_set() for conjunct in group
+            ))
+            subtotal = 0
+            for value in (True, False):
+                model[p] = value
+                subtotal += count(group, symbols - {p}, model)
+            del model[p]
+            if subtotal == 0:
+                return 0
+            total *= subtotal
+
+        # Symbols no pending conjunct mentions are unconstrained
+        return total * 2 ** len(free - constrained)
+
+    conjuncts = conjuncts_of(knowledge)
+    return count(conjuncts, set(knowledge.symbol_set()), dict())
@@ -9,6 +9,39 @@ X = "X"
 O = "O"
 EMPTY = None
 
+# Cells tried first by alpha-beta search: center, then corners, then edges
+MOVE_ORDER = [(1, 1), (0, 0), (0, 2), (2, 0), (2, 2),
+              (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# The 8 rotations and reflections of the board, each as the list of the
+# cell (i, j) that moves to each cell, in row-major order
+SYMMETRIES = [
+    [cell(i, j) for i in range(3) for j in range(3)]
+    for cell in (
+        lambda i, j: (i, j),
+        lambda i, j: (2 - j, i),
+        lambda i, j: (2 - i, 2 - j),
+        lambda i, j: (j, 2 - i),
+        lambda i, j: (i, 2 - j),
+        lambda i, j: (2 - i, j),
+        lambda i, j: (j, i),
+        lambda i, j: (2 - j, 2 - i)
+    )
+]
+
+# Base-3 digit of each cell in a packed board
+DIGITS = {EMPTY: 0, X: 1, O: 2}
+
+# Kinds of score stored in the transposition table
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# Maps each canonical packed board searched by alpha-beta to its score,
+# the kind of score, and the best move found in the canonical board.
+# It is kept for the life of the process, across calls to `minimax`.
+transpositions = dict()
+
 
 def initial_state():
     """
@@ -106,18 +139,20 @@ def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    result = winner(board)
-    if result is X:
-        return 1
-    elif result is O:
-        return -1
-    else:
-        return 0
+    return utility_of(winner(board))
 
-def minimax(board):
+def minimax(board, pruning=True, memo=True):
     """
     Returns the optimal action for the current player on the board.
+
+    With `pruning`, the game tree is searched with alpha-beta pruning,
+    which returns the same action as the full search. With `memo` as
+    well, the scores of boards, up to rotation and reflection, are kept
+    in the transposition table and reused by later searches.
     """
+    if pruning:
+        return alpha_beta_action(board, transpositions if memo else None)
+
     current_player = player(board)
     best_action = None
 
@@ -155,4 +190,133 @@ def min_score(board):
     best_score = math.inf
     for action in actions(board):
         best_score = min(best_score, max_score(result(board, action)))
-    return best_score
\ No newline at end of file
+    return best_score
+
+def alpha_beta_action(board, table=None):
+    """
+    Returns the optimal action for the current player on the board,
+    found with alpha-beta search using the transposition `table`, if any.
+
+    Moves at the top are tried in the same order as `minimax` and only a
+    strictly better score replaces the best so far, so ties are broken
+    the same way; each later move only has to be searched far enough to
+    show it is no better.
+    """
+    board = [list(row) for row in board]
+    current_player = player(board)
+    opponent = O if current_player is X else X
+    best_action = None
+    best_score = -math.inf if current_player is X else math.inf
+
+    for i, j in actions(board):
+        board[i][j] = current_player
+        if current_player is X:
+            score = alpha_beta(board, opponent, best_score, math.inf,
+                               table)
+            better = score > best_score
+        else:
+            score = alpha_beta(board, opponent, -math.inf, best_score,
+                               table)
+            better = score < best_score
+        board[i][j] = EMPTY
+        if better:
+            best_score = score
+            best_action = (i, j)
+
+            # No move can do better than winning
+            if best_score == utility_of(current_player):
+                break
+    return best_action
+
+
+def alpha_beta(board, current_player, alpha, beta, table=None):
+    """
+    Returns the score of the board with `current_player` to move if it is
+    between `alpha` and `beta`; otherwise a bound on the score on the
+    same side of them. The board is modified during the search but is
+    restored before returning.
+
+    If `table` is given, scores are looked up in and stored to it under
+    the board's canonical packing, and the best move stored for a board
+    is tried first.
+    """
+    result = winner(board)
+    if result is not None:
+        return utility_of(result)
+    moves = [(i, j) for i, j in MOVE_ORDER if board[i][j] is EMPTY]
+    if not moves:
+        return 0
+
+    if table is not None:
+        key, symmetry = canonical(board)
+        if key in table:
+            score, kind, move = table[key]
+            if (kind is EXACT or
+                    kind is LOWER and score >= beta or
+                    kind is UPPER and score <= alpha):
+                return score
+            move = symmetry[move]
+            moves.remove(move)
+            moves.insert(0, move)
+    window = alpha, beta
+
+    best_move = None
+    if current_player is X:
+        best_score = -math.inf
+        for i, j in moves:
+            board[i][j] = X
+            score = alpha_beta(board, O, alpha, beta, table)
+            board[i][j] = EMPTY
+            if score > best_score:
+                best_score = score
+                best_move = (i, j)
+            alpha = max(alpha, best_score)
+            if alpha >= beta:
+                break
+    else:
+        best_score = math.inf
+        for i, j in moves:
+            board[i][j] = O
+            score = alpha_beta(board, X, alpha, beta, table)
+            board[i][j] = EMPTY
+            if score < best_score:
+                best_score = score
+                best_move = (i, j)
+            beta = min(beta, best_score)
+            if alpha >= beta:
+                break
+
+    if table is not None:
+        if best_score <= window[0]:
+            kind = UPPER
+        elif best_score >= window[1]:
+            kind = LOWER
+        else:
+            kind = EXACT
+        table[key] = (best_score, kind, symmetry.index(best_move))
+    return best_score
+
+
+def canonical(board):
+    """
+    Returns the smallest packing of the board into an integer, with one
+    base-3 digit per cell, over its rotations and reflections, and the
+    symmetry that gives it, as in `SYMMETRIES`.
+    """
+    packings = [
+        (sum(DIGITS[board[i][j]] * 3 ** k
+             for k, (i, j) in enumerate(symmetry)), symmetry)
+        for symmetry in SYMMETRIES
+    ]
+    return min(packings, key=lambda packing: packing[0])
+
+
+def utility_of(result):
+    """
+    Returns 1 if `result` is X, -1 if it is O, 0 otherwise.
+    """
+    if result is X:
+        return 1
+    elif result is O:
+        return -1
+    return 0